@@ -0,0 +1,130 @@
+"""
+  Benchmarks for the Omnik/Trannergy PV Inverter integration.
+
+  Measures the cost of the steps of a poll against recorded frames, without
+  any network traffic: building the request, parsing and decoding the
+  response, updating the sensor data with all SENSOR_TYPES enabled,
+  updating the sensor entity attributes, and all of these steps together as
+  the processing cost of one poll.
+
+  Home Assistant must be installed to import the integration. Run from the
+  root of the repository:
+
+    python benchmarks/bench_omnik.py [--number N] [--repeat R]
+
+  For every step the best and median time per call and the peak memory
+  allocated by a single call are reported.
+"""
+
+import argparse
+import statistics
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from custom_components.omnik.protocol import OmnikFrameParser, generate_request  # noqa: E402
+from custom_components.omnik.sensor import (  # noqa: E402
+  SENSOR_TYPES,
+  OmnikData,
+  OmnikReading,
+  OmnikSensor,
+)
+
+from frames import FRAMES, LOGGER_SERIAL  # noqa: E402
+
+def _peak_allocation(func):
+  """ Return the peak number of bytes allocated by a single call. """
+  func()
+  tracemalloc.start()
+  tracemalloc.reset_peak()
+  start, _ = tracemalloc.get_traced_memory()
+  func()
+  _, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  return peak - start
+
+def _measure(name, func, number, repeat):
+  """ Time a function and print one line of results. """
+  timings = [t / number for t in timeit.repeat(func, number=number, repeat=repeat)]
+  print('{:<40} {:>10.2f} {:>10.2f} {:>10}'.format(
+    name, min(timings) * 1e6, statistics.median(timings) * 1e6, _peak_allocation(func)))
+
+def _decode(frame):
+  """ Parse and decode a received response, as done for every poll. """
+  parser = OmnikFrameParser()
+
+  def decode():
+    parser.reset()
+    frames = parser.feed(frame)
+    return OmnikReading.from_frame(max(frames, key=len)) if frames else None
+
+  return decode
+
+def _sensor_data(frame):
+  """ Update the data of all sensor types from a received response. """
+  data = OmnikData('localhost', 8899, LOGGER_SERIAL, list(SENSOR_TYPES))
+  frames = OmnikFrameParser().feed(frame)
+  data.interface_inverter.raw_msg = frames[0] if frames else None
+  data.interface_inverter.reading = OmnikReading.from_frame(data.interface_inverter.raw_msg)
+  return data
+
+def _poll(frame):
+  """ Decode a response and update the data and a sensor with it. """
+  data = OmnikData('localhost', 8899, LOGGER_SERIAL, list(SENSOR_TYPES))
+  inverter = data.interface_inverter
+  coordinator = SimpleNamespace(data=data.get_sensor_data())
+  subtypes = [type for type in SENSOR_TYPES if type != 'actualpower']
+  sensor = OmnikSensor('Omnik', LOGGER_SERIAL, coordinator, 'actualpower', subtypes)
+  parser = OmnikFrameParser()
+
+  def poll():
+    parser.reset()
+    frames = parser.feed(frame)
+    inverter.raw_msg = max(frames, key=len) if frames else None
+    inverter.reading = OmnikReading.from_frame(inverter.raw_msg)
+    data.update_sensor_values()
+    coordinator.data = data.get_sensor_data()
+    sensor._update_from_data()
+
+  return poll
+
+def main():
+  """ Run the benchmarks. """
+  parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+  parser.add_argument('--number', type=int, default=10000, help='calls per timing run')
+  parser.add_argument('--repeat', type=int, default=5, help='number of timing runs')
+  args = parser.parse_args()
+
+  print('{:<40} {:>10} {:>10} {:>10}'.format('benchmark', 'best us', 'median us', 'peak B'))
+
+  _measure('generate_request', lambda: generate_request(LOGGER_SERIAL),
+           args.number, args.repeat)
+
+  for name, frame in FRAMES.items():
+    _measure('decode[{}]'.format(name), _decode(frame), args.number, args.repeat)
+
+  for name, frame in FRAMES.items():
+    data = _sensor_data(frame)
+    _measure('update_sensor_values[{}]'.format(name), data.update_sensor_values,
+             args.number, args.repeat)
+
+  """ A sensor with all other sensor types as attributes. """
+  for name, frame in FRAMES.items():
+    data = _sensor_data(frame)
+    data.update_sensor_values()
+    coordinator = SimpleNamespace(data=data.get_sensor_data())
+    subtypes = [type for type in SENSOR_TYPES if type != 'actualpower']
+    sensor = OmnikSensor('Omnik', LOGGER_SERIAL, coordinator, 'actualpower', subtypes)
+    _measure('sensor_update[{}]'.format(name), sensor._update_from_data,
+             args.number, args.repeat)
+
+  """ All processing of one poll after the response has been received. """
+  for name, frame in FRAMES.items():
+    _measure('poll[{}]'.format(name), _poll(frame), args.number, args.repeat)
+
+if __name__ == '__main__':
+  main()
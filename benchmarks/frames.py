@@ -0,0 +1,31 @@
+"""
+  Recorded responses of an Omnik/Trannergy Wi-Fi logger with serial number
+  1612345603, used by the benchmarks.
+"""
+
+LOGGER_SERIAL = 1612345603
+
+""" Statistics frame of an inverter which is producing power. """
+ONLINE_FRAME = bytes.fromhex(
+  '685741b003711a6003711a608102014e4c444e333032303133305034303030015e09c4'
+  '0960ffff001f001effff0034ffffffff08fdffffffff138804d2ffffffffffffffff04'
+  'd20000ddd5000010e100000000000000000000000000000000000000002216'
+)
+
+""" Acknowledgement sent by the logger when the inverter has no data. """
+OFFLINE_FRAME = bytes.fromhex(
+  '681141b003711a6003711a60444154412053454e44204953204f4b0d0acf16'
+)
+
+""" No response at all. """
+EMPTY_FRAME = b''
+
+""" Statistics frame which was cut off during transmission. """
+TRUNCATED_FRAME = ONLINE_FRAME[:50]
+
+FRAMES = {
+  'online': ONLINE_FRAME,
+  'offline': OFFLINE_FRAME,
+  'empty': EMPTY_FRAME,
+  'truncated': TRUNCATED_FRAME,
+}
@@ -1 +1,15 @@
 """The Omnik/Trannergy PV Inverter integration."""
+
+import homeassistant.helpers.config_validation as cv
+
+from .const import DOMAIN
+from . import diagnostics, discovery
+
+CONFIG_SCHEMA = cv.platform_only_config_schema(DOMAIN)
+
+async def async_setup(hass, config):
+  """ Set up the Omnik integration. """
+  hass.data.setdefault(DOMAIN, {})
+  diagnostics.async_setup_services(hass)
+  discovery.async_setup_services(hass)
+  return True
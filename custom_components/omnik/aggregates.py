@@ -0,0 +1,160 @@
+"""
+  Rolling aggregates and derived values of the readings of an inverter.
+
+  Every sample is processed in constant (amortized) time: the rolling windows
+  keep a running sum for the mean and monotonic deques for the minimum and
+  maximum, so no window is ever scanned.
+"""
+
+from collections import deque
+
+""" Windows of the rolling aggregates of the actual power, in seconds. """
+WINDOWS = {'5m': 300, '1h': 3600}
+
+""" Longest gap between two samples over which the power is integrated. """
+MAX_INTEGRATION_GAP = 900
+
+""" Resolution of the energy counter of the inverter in kWh. """
+ENERGY_RESOLUTION = 0.01
+
+DERIVED_SENSOR_TYPES = ['dcinputpower', 'efficiency', 'energytodayintegrated']
+DERIVED_SENSOR_TYPES.extend('dcinputpower{}'.format(channel) for channel in range(1, 4))
+DERIVED_SENSOR_TYPES.extend('actualpower{}{}'.format(aggregate, window)
+                            for window in WINDOWS for aggregate in ('avg', 'min', 'max'))
+
+class OmnikRollingWindow():
+  """ Mean, minimum and maximum of the samples within a period of time. """
+
+  def __init__(self, period):
+    """
+      Initialize the window.
+
+      Args:
+        period (float): length of the window in seconds
+    """
+    self._period = period
+    self._samples = deque()
+    self._minimums = deque()
+    self._maximums = deque()
+    self._total = 0.0
+
+  def add(self, timestamp, value):
+    """ Add a sample and drop the samples which fell out of the window. """
+    self._samples.append((timestamp, value))
+    self._total += value
+
+    minimums = self._minimums
+    while minimums and minimums[-1][1] >= value:
+      minimums.pop()
+    minimums.append((timestamp, value))
+
+    maximums = self._maximums
+    while maximums and maximums[-1][1] <= value:
+      maximums.pop()
+    maximums.append((timestamp, value))
+
+    oldest = timestamp - self._period
+    samples = self._samples
+    while samples[0][0] <= oldest:
+      self._total -= samples.popleft()[1]
+    while minimums[0][0] <= oldest:
+      minimums.popleft()
+    while maximums[0][0] <= oldest:
+      maximums.popleft()
+
+  def mean(self):
+    """ Return the mean of the samples in the window. """
+    return self._total / len(self._samples) if self._samples else None
+
+  def minimum(self):
+    """ Return the minimum of the samples in the window. """
+    return self._minimums[0][1] if self._minimums else None
+
+  def maximum(self):
+    """ Return the maximum of the samples in the window. """
+    return self._maximums[0][1] if self._maximums else None
+
+class OmnikAggregator():
+  """
+    Derived values of the readings of an inverter.
+
+    The power of each DC string is its voltage times its current, and the
+    efficiency is the AC power as a percentage of the DC power. The energy of
+    today is integrated from the actual power, and kept within the resolution
+    of the energy counter of the inverter, which gives a value with a finer
+    resolution than the 0.01 kWh of the inverter itself.
+  """
+
+  def __init__(self):
+    """ Initialize the aggregator. """
+    self._windows = {window: OmnikRollingWindow(period) for window, period in WINDOWS.items()}
+    self._last_time = None
+    self._last_power = None
+    self._last_today = None
+    self._energy = None
+    self.values = dict.fromkeys(DERIVED_SENSOR_TYPES)
+
+  def update(self, timestamp, reading):
+    """
+      Add the reading of a poll.
+
+      Args:
+        timestamp (float): monotonic time of the poll in seconds
+        reading (OmnikReading): the decoded frame, or None when the inverter
+          did not send statistics
+      Returns:
+        dict: the derived values per sensor type
+    """
+    values = self.values
+    online = reading is not None and reading.temperature is not None
+
+    """ Power of the DC strings and efficiency of the conversion. """
+    dc_power = None
+    for channel in range(3):
+      string_power = None
+      if online:
+        voltage = reading.dcinputvoltage[channel]
+        current = reading.dcinputcurrent[channel]
+        if voltage >= 0 and current >= 0:
+          string_power = round(voltage * current, 1)
+          dc_power = string_power if dc_power is None else dc_power + string_power
+      values['dcinputpower{}'.format(channel + 1)] = string_power
+    values['dcinputpower'] = dc_power if dc_power is None else round(dc_power, 1)
+
+    power = reading.actualpower if online else 0
+    if power is not None and power < 0:
+      power = None
+    values['efficiency'] = None
+    if power is not None and dc_power:
+      values['efficiency'] = round(min(power / dc_power * 100, 100), 1)
+
+    """ Rolling aggregates of the actual power. """
+    if power is not None:
+      for window, aggregates in self._windows.items():
+        aggregates.add(timestamp, power)
+        values['actualpoweravg' + window] = round(aggregates.mean(), 1)
+        values['actualpowermin' + window] = aggregates.minimum()
+        values['actualpowermax' + window] = aggregates.maximum()
+
+    self._integrate(timestamp, power, reading.energytoday if online else None)
+    values['energytodayintegrated'] = None if self._energy is None else round(self._energy, 4)
+    return values
+
+  def _integrate(self, timestamp, power, today):
+    """ Integrate the power since the previous sample into the energy of today. """
+    if today is not None and today >= 0:
+      if self._energy is None or (self._last_today is not None and today < self._last_today):
+        """ Start counting, or a new day has started. """
+        self._energy = today
+      self._last_today = today
+
+    if (self._energy is not None and power is not None and self._last_power is not None and
+        timestamp - self._last_time <= MAX_INTEGRATION_GAP):
+      self._energy += (self._last_power + power) / 2 * (timestamp - self._last_time) / 3600000
+
+    if today is not None and today >= 0 and self._energy is not None:
+      """ Stay within the resolution of the energy counter of the inverter. """
+      self._energy = min(max(self._energy, today), today + ENERGY_RESOLUTION)
+
+    self._last_time = timestamp
+    self._last_power = power
@@ -0,0 +1,194 @@
+"""
+  Capture log of the raw frames received from the inverters.
+
+  The log is an append-only file of fixed-size records, each holding the
+  time a frame was received and the raw frame:
+
+    offset  size  content
+    0       8     receive time in seconds since the epoch (big-endian double)
+    8       2     length of the frame (big-endian unsigned short)
+    10      270   the frame, padded with zeros
+
+  When a file holds the maximum number of records it is rotated to `.1`,
+  `.2`, ... and the oldest file is removed. Because all records have the same
+  size, a file can be memory-mapped and decoded at once with NumPy by
+  `read_capture`.
+
+  A crash or power loss can leave part of a record at the end of the file.
+  Before the first write after a start the file is truncated to its last
+  complete record, so the records which follow stay aligned.
+"""
+
+import os
+import struct
+
+from .const import FRAME_LAYOUT_END, FRAME_OVERHEAD
+
+CAPTURE_HEADER = struct.Struct('!dH')
+CAPTURE_FRAME_SIZE = 255 + FRAME_OVERHEAD + 1
+CAPTURE_RECORD_SIZE = CAPTURE_HEADER.size + CAPTURE_FRAME_SIZE
+CAPTURE_FLUSH_RECORDS = 10
+DEFAULT_CAPTURE_MAX_RECORDS = 100000
+DEFAULT_CAPTURE_BACKUPS = 5
+
+class OmnikCaptureLog():
+  """
+    Writer of a capture log.
+
+    Records are collected in memory by `append`, which is cheap enough to call
+    from the event loop. The pending records are taken by `take`, also on the
+    event loop, and written to the file by `write`, which does blocking file
+    I/O and should be run in an executor, one write at a time. `flush` does
+    both at once.
+  """
+
+  def __init__(self, path, max_records=DEFAULT_CAPTURE_MAX_RECORDS, backups=DEFAULT_CAPTURE_BACKUPS):
+    """
+      Initialize the capture log.
+
+      Args:
+        path (str): path of the capture file
+        max_records (int): number of records after which the file is rotated
+        backups (int): number of rotated files to keep
+    """
+    self._path = path
+    self._max_records = max_records
+    self._backups = backups
+    self._pending = bytearray()
+    self._records = None
+
+  def append(self, timestamp, frame):
+    """
+      Add a frame to the log.
+
+      Args:
+        timestamp (float): receive time in seconds since the epoch
+        frame (bytes): the raw frame
+      Returns:
+        bool: whether enough records are pending to flush them
+    """
+    frame = frame[:CAPTURE_FRAME_SIZE]
+    self._pending += CAPTURE_HEADER.pack(timestamp, len(frame))
+    self._pending += frame
+    self._pending += bytes(CAPTURE_FRAME_SIZE - len(frame))
+    return len(self._pending) >= CAPTURE_FLUSH_RECORDS * CAPTURE_RECORD_SIZE
+
+  def take(self):
+    """ Return the pending records and start collecting new ones. """
+    pending = self._pending
+    self._pending = bytearray()
+    return pending
+
+  def flush(self):
+    """ Write the pending records to the file. """
+    self.write(self.take())
+
+  def write(self, pending):
+    """
+      Write records to the file, rotating it when full.
+
+      Args:
+        pending (bytearray): records returned by `take`
+    """
+    if self._records is None:
+      os.makedirs(os.path.dirname(self._path) or '.', exist_ok=True)
+      try:
+        size = os.path.getsize(self._path)
+      except OSError:
+        size = 0
+      self._records = size // CAPTURE_RECORD_SIZE
+      if size % CAPTURE_RECORD_SIZE:
+        """ Drop a partial record left by a crash. """
+        os.truncate(self._path, self._records * CAPTURE_RECORD_SIZE)
+
+    with memoryview(pending) as view:
+      pos = 0
+      while pos < len(view):
+        if self._records >= self._max_records:
+          self._rotate()
+        count = min(self._max_records - self._records, (len(view) - pos) // CAPTURE_RECORD_SIZE)
+        end = pos + count * CAPTURE_RECORD_SIZE
+        with open(self._path, 'ab') as file:
+          file.write(view[pos:end])
+        self._records += count
+        pos = end
+
+  def _rotate(self):
+    """ Move the current file to the first backup and shift the others. """
+    for index in range(self._backups - 1, 0, -1):
+      source = '{}.{}'.format(self._path, index)
+      if os.path.exists(source):
+        os.replace(source, '{}.{}'.format(self._path, index + 1))
+    if self._backups > 0:
+      os.replace(self._path, '{}.1'.format(self._path))
+    else:
+      os.remove(self._path)
+    self._records = 0
+
+def _capture_dtype(np):
+  """ NumPy record type matching the capture records and the frame layout. """
+  frame = CAPTURE_HEADER.size
+  return np.dtype({
+    'names': ['time', 'length', 'invertersn', 'temperature', 'dcinputvoltage', 'dcinputcurrent',
+              'acoutputcurrent', 'acoutputvoltage', 'acoutput', 'energytoday', 'energytotal', 'hourstotal'],
+    'formats': ['>f8', '>u2', 'S16', '>u2', ('>u2', (3,)), ('>u2', (3,)),
+                ('>u2', (3,)), ('>u2', (3,)), ('>u2', (3, 2)), '>u2', '>u4', '>u4'],
+    'offsets': [0, 8, frame + 15, frame + 31, frame + 33, frame + 39,
+                frame + 45, frame + 51, frame + 57, frame + 69, frame + 71, frame + 75],
+    'itemsize': CAPTURE_RECORD_SIZE,
+  })
+
+def read_capture(path):
+  """
+    Decode all frames of a capture file into columns.
+
+    The file is memory-mapped and every field is decoded for all records at
+    once. Values are scaled as by OmnikReading: an unused channel is -1, and
+    all values of a record without a statistics frame are NaN. Channel values
+    have one column per channel.
+
+    Requires NumPy.
+
+    Args:
+      path (str): path of the capture file
+    Returns:
+      dict: NumPy array per field, with one row per record
+  """
+  import numpy as np
+
+  dtype = _capture_dtype(np)
+  count = os.path.getsize(path) // CAPTURE_RECORD_SIZE
+  if count == 0:
+    records = np.zeros(0, dtype=dtype)
+  else:
+    records = np.memmap(path, dtype=dtype, mode='r', shape=(count,))
+
+  valid = records['length'] >= FRAME_LAYOUT_END
+
+  def scale(raw, divider):
+    values = raw / divider
+    values[raw == 65535] = -1
+    values[~valid] = np.nan
+    return values
+
+  temperature = scale(records['temperature'], 10)
+  temperature[temperature > 150] = np.nan
+  acoutput = records['acoutput']
+  acoutputpower = scale(acoutput[:, :, 1], 1)
+
+  return {
+    'time': np.asarray(records['time'], dtype=np.float64),
+    'valid': valid,
+    'invertersn': np.where(valid, records['invertersn'], b''),
+    'temperature': temperature,
+    'dcinputvoltage': scale(records['dcinputvoltage'], 10),
+    'dcinputcurrent': scale(records['dcinputcurrent'], 10),
+    'acoutputcurrent': scale(records['acoutputcurrent'], 10),
+    'acoutputvoltage': scale(records['acoutputvoltage'], 10),
+    'acoutputfrequency': scale(acoutput[:, :, 0], 100),
+    'acoutputpower': acoutputpower,
+    'actualpower': acoutputpower[:, 0],
+    'energytoday': scale(records['energytoday'], 100),
+    'energytotal': np.where(valid, records['energytotal'] / 10, np.nan),
+    'hourstotal': np.where(valid, records['hourstotal'].astype(np.float64), np.nan),
+  }
@@ -0,0 +1,29 @@
+"""Constants for the Omnik/Trannergy PV Inverter integration."""
+
+import struct
+
+DOMAIN = 'omnik'
+
+DATA_COORDINATORS = 'coordinators'
+
+DEFAULT_PORT_INVERTER = 8899
+
+""" Layout of the values in a statistics frame, starting at the serial number. """
+FRAME_LAYOUT = struct.Struct(
+  '!16s'  # 15: inverter serial number
+  'H'     # 31: temperature
+  '3H'    # 33: DC input voltage 1-3
+  '3H'    # 39: DC input current 1-3
+  '3H'    # 45: AC output current 1-3
+  '3H'    # 51: AC output voltage 1-3
+  '6H'    # 57: AC output frequency and power 1-3 (interleaved)
+  'H'     # 69: energy today
+  'I'     # 71: energy total
+  'I'     # 75: hours total
+)
+FRAME_START = 0x68
+FRAME_END = 0x16
+FRAME_OVERHEAD = 14
+FRAME_HEADER_SIZE = 12
+FRAME_LAYOUT_OFFSET = 15
+FRAME_LAYOUT_END = FRAME_LAYOUT_OFFSET + FRAME_LAYOUT.size
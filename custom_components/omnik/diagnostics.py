@@ -0,0 +1,36 @@
+"""
+  Diagnostics for the Omnik/Trannergy PV Inverter integration.
+
+  The integration is configured in YAML and therefore has no config entry to
+  download diagnostics for. Instead the diagnostics of all inverters are
+  returned by the `omnik.get_diagnostics` service.
+"""
+
+from homeassistant.core import SupportsResponse, callback
+
+from .const import DATA_COORDINATORS, DOMAIN
+
+SERVICE_GET_DIAGNOSTICS = 'get_diagnostics'
+
+@callback
+def async_get_diagnostics(hass):
+  """ Return the diagnostics of all configured inverters. """
+  coordinators = hass.data.get(DOMAIN, {}).get(DATA_COORDINATORS, [])
+  inverters = []
+  for coordinator in coordinators:
+    diagnostics = {'name': coordinator.name, **coordinator.omnik_data.get_diagnostics()}
+    if coordinator.sampler is not None:
+      diagnostics['five_minutes'] = coordinator.sampler.five_minutes
+    inverters.append(diagnostics)
+  return {'inverters': inverters}
+
+@callback
+def async_setup_services(hass):
+  """ Register the diagnostics service. """
+
+  async def async_handle_get_diagnostics(call):
+    """ Handle the get_diagnostics service call. """
+    return async_get_diagnostics(hass)
+
+  hass.services.async_register(DOMAIN, SERVICE_GET_DIAGNOSTICS, async_handle_get_diagnostics,
+                               supports_response=SupportsResponse.ONLY)
@@ -0,0 +1,157 @@
+"""
+  Discovery of the inverters on the local network.
+
+  Two methods are combined, both run concurrently:
+
+  * the Wi-Fi loggers answer a UDP broadcast of `WIFIKIT-214028-READ` on port
+    48899 with their IP address, MAC address and serial number;
+  * every address of a subnet of at most /22 is probed for an open inverter
+    port by a fixed pool of workers, with a short timeout.
+
+  The serial number is only known for loggers which answered the broadcast,
+  as a logger does not answer requests for another serial number.
+"""
+
+import asyncio
+import ipaddress
+import logging
+
+import voluptuous as vol
+
+from homeassistant.core import SupportsResponse, callback
+import homeassistant.helpers.config_validation as cv
+
+from .const import DEFAULT_PORT_INVERTER, DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+DISCOVERY_PORT = 48899
+DISCOVERY_MESSAGE = b'WIFIKIT-214028-READ'
+DISCOVERY_TIMEOUT = 2
+PROBE_TIMEOUT = 1
+MAX_CONCURRENT_PROBES = 64
+MIN_SUBNET_PREFIX = 22
+
+SERVICE_DISCOVER = 'discover'
+ATTR_SUBNET = 'subnet'
+ATTR_PORT = 'port'
+
+def _subnet(value):
+  """ Validate a subnet which is small enough to be scanned. """
+  try:
+    network = ipaddress.IPv4Network(cv.string(value), strict=False)
+  except ValueError as err:
+    raise vol.Invalid('subnet {} is not valid: {}'.format(value, err))
+  if network.prefixlen < MIN_SUBNET_PREFIX:
+    raise vol.Invalid('subnet {} is larger than /{}'.format(value, MIN_SUBNET_PREFIX))
+  return network
+
+DISCOVER_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_SUBNET): _subnet,
+    vol.Optional(ATTR_PORT, default=DEFAULT_PORT_INVERTER): cv.port,
+})
+
+class OmnikDiscoveryProtocol(asyncio.DatagramProtocol):
+  """ Collect the answers of the loggers to the discovery broadcast. """
+
+  def __init__(self):
+    """ Initialize the protocol. """
+    self.loggers = {}
+
+  def datagram_received(self, data, addr):
+    """ Parse an answer of the form `ip,mac,serial`. """
+    try:
+      host, mac, serial = data.decode().strip().split(',')
+      host = str(ipaddress.IPv4Address(host))
+      self.loggers[host] = {'host': host, 'mac': mac, 'serial': int(serial)}
+    except ValueError:
+      _LOGGER.debug('Invalid discovery answer from %s: %r', addr[0], data)
+
+async def async_broadcast(address='255.255.255.255', timeout=DISCOVERY_TIMEOUT):
+  """
+    Broadcast the discovery message and collect the answers of the loggers.
+
+    Args:
+      address (str): broadcast address (Default: 255.255.255.255)
+      timeout (float): time in seconds to wait for answers
+    Returns:
+      dict: host, MAC address and serial number per host
+  """
+  loop = asyncio.get_running_loop()
+  transport, protocol = await loop.create_datagram_endpoint(
+    OmnikDiscoveryProtocol, local_addr=('0.0.0.0', 0), allow_broadcast=True)
+  try:
+    transport.sendto(DISCOVERY_MESSAGE, (address, DISCOVERY_PORT))
+    await asyncio.sleep(timeout)
+  finally:
+    transport.close()
+  return protocol.loggers
+
+async def async_probe(hosts, port=DEFAULT_PORT_INVERTER, timeout=PROBE_TIMEOUT,
+                      max_concurrent=MAX_CONCURRENT_PROBES):
+  """
+    Find the hosts which accept connections on the inverter port.
+
+    A fixed pool of workers takes the hosts one by one, so the number of
+    coroutines does not grow with the number of hosts.
+
+    Args:
+      hosts (iterable): addresses to probe
+      port (int): TCP port of the inverters (Default: 8899)
+      timeout (float): time in seconds to wait for a connection
+      max_concurrent (int): maximum number of connections at the same time
+    Returns:
+      list: the hosts with an open inverter port
+  """
+  hosts = iter(hosts)
+  found = []
+
+  async def async_probe_hosts():
+    """ Try to connect to the next host until all hosts have been probed. """
+    for host in hosts:
+      host = str(host)
+      try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+      except (OSError, asyncio.TimeoutError):
+        continue
+      writer.close()
+      found.append(host)
+
+  await asyncio.gather(*(async_probe_hosts() for _ in range(max_concurrent)))
+  return found
+
+async def async_discover(subnet=None, port=DEFAULT_PORT_INVERTER):
+  """
+    Discover the inverters on the local network.
+
+    Args:
+      subnet (IPv4Network): subnet to probe, or None to only broadcast
+      port (int): TCP port of the inverters (Default: 8899)
+    Returns:
+      list: host, port, MAC address and serial number (None when unknown) of
+        every inverter found, ordered by address
+  """
+  if subnet is None:
+    loggers = await async_broadcast()
+    hosts = []
+  else:
+    loggers, hosts = await asyncio.gather(
+      async_broadcast(str(subnet.broadcast_address)), async_probe(subnet.hosts(), port))
+
+  inverters = {host: {'host': host, 'mac': None, 'serial': None} for host in hosts}
+  inverters.update(loggers)
+  return [
+    {'port': port, **inverters[host]}
+    for host in sorted(inverters, key=ipaddress.IPv4Address)
+  ]
+
+@callback
+def async_setup_services(hass):
+  """ Register the discovery service. """
+
+  async def async_handle_discover(call):
+    """ Handle the discover service call. """
+    return {'inverters': await async_discover(call.data.get(ATTR_SUBNET), call.data[ATTR_PORT])}
+
+  hass.services.async_register(DOMAIN, SERVICE_DISCOVER, async_handle_discover, schema=DISCOVER_SCHEMA,
+                               supports_response=SupportsResponse.ONLY)
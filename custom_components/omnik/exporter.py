@@ -0,0 +1,212 @@
+"""
+  Prometheus/OpenMetrics exporter of the readings of the inverters.
+
+  The metrics of an inverter are rendered once after each of its polls. The
+  complete HTTP response, for all inverters, is then kept as a single buffer,
+  so a scrape is answered with one write whatever the number of scrapers and
+  inverters.
+"""
+
+import asyncio
+import logging
+
+from .metrics import PERCENTILES
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_EXPORTER_PORT = 9899
+EXPORTER_PATH = b'/metrics'
+REQUEST_MAX_SIZE = 8192
+
+CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+""" Metric families: name, type, unit and help text. """
+FAMILIES = (
+  ('omnik_up', 'gauge', None, 'Whether the inverter sent statistics in the last poll.'),
+  ('omnik_actual_power_watts', 'gauge', 'watts', 'Actual power.'),
+  ('omnik_energy_today_kilowatt_hours', 'gauge', 'kilowatt_hours', 'Energy generated today.'),
+  ('omnik_energy_kilowatt_hours', 'counter', 'kilowatt_hours', 'Energy generated in total.'),
+  ('omnik_operation_hours', 'counter', 'hours', 'Hours the inverter generated electricity.'),
+  ('omnik_temperature_celsius', 'gauge', 'celsius', 'Temperature of the inverter.'),
+  ('omnik_dc_input_voltage_volts', 'gauge', 'volts', 'DC input voltage per channel.'),
+  ('omnik_dc_input_current_amperes', 'gauge', 'amperes', 'DC input current per channel.'),
+  ('omnik_ac_output_voltage_volts', 'gauge', 'volts', 'AC output voltage per channel.'),
+  ('omnik_ac_output_current_amperes', 'gauge', 'amperes', 'AC output current per channel.'),
+  ('omnik_ac_output_frequency_hertz', 'gauge', 'hertz', 'AC output frequency per channel.'),
+  ('omnik_ac_output_power_watts', 'gauge', 'watts', 'AC output power per channel.'),
+  ('omnik_polls', 'counter', None, 'Polls of the inverter.'),
+  ('omnik_poll_successes', 'counter', None, 'Polls with a valid response.'),
+  ('omnik_poll_failures', 'counter', None, 'Failed connections or requests by cause.'),
+  ('omnik_frames', 'counter', None, 'Responses without statistics by kind: invalid, short or offline.'),
+  ('omnik_poll_duration_seconds', 'gauge', 'seconds', 'Percentiles of the duration of a poll.'),
+)
+
+""" Reading fields with a value per channel, by metric family. """
+CHANNEL_FAMILIES = (
+  ('omnik_dc_input_voltage_volts', 'dcinputvoltage'),
+  ('omnik_dc_input_current_amperes', 'dcinputcurrent'),
+  ('omnik_ac_output_voltage_volts', 'acoutputvoltage'),
+  ('omnik_ac_output_current_amperes', 'acoutputcurrent'),
+  ('omnik_ac_output_frequency_hertz', 'acoutputfrequency'),
+  ('omnik_ac_output_power_watts', 'acoutputpower'),
+)
+
+FAILURE_COUNTERS = ('timeouts', 'refused', 'dns_failures', 'connection_errors')
+FRAME_COUNTERS = (('invalid', 'invalid_frames'), ('short', 'short_frames'), ('offline', 'offline_frames'))
+
+def _escape(value):
+  """ Escape a label value. """
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_inverter(name, data):
+  """
+    Render the samples of one inverter.
+
+    Args:
+      name (str): name of the inverter
+      data (OmnikData): data of the inverter
+    Returns:
+      dict: the sample lines per metric family
+  """
+  labels = 'serial="{}",inverter="{}"'.format(data.get_inverter_sn(), _escape(name))
+  reading = data.interface_inverter.reading
+  metrics = data.interface_inverter.metrics
+  online = data.is_online()
+  samples = {family: [] for family, _, _, _ in FAMILIES}
+
+  samples['omnik_up'].append('omnik_up{{{}}} {}\n'.format(labels, int(online)))
+  if online:
+    samples['omnik_actual_power_watts'].append(
+      'omnik_actual_power_watts{{{}}} {}\n'.format(labels, reading.actualpower))
+    samples['omnik_energy_today_kilowatt_hours'].append(
+      'omnik_energy_today_kilowatt_hours{{{}}} {}\n'.format(labels, reading.energytoday))
+    samples['omnik_energy_kilowatt_hours'].append(
+      'omnik_energy_kilowatt_hours_total{{{}}} {}\n'.format(labels, reading.energytotal))
+    samples['omnik_operation_hours'].append(
+      'omnik_operation_hours_total{{{}}} {}\n'.format(labels, reading.hourstotal))
+    samples['omnik_temperature_celsius'].append(
+      'omnik_temperature_celsius{{{}}} {}\n'.format(labels, reading.temperature))
+    for family, field in CHANNEL_FAMILIES:
+      for channel, value in enumerate(getattr(reading, field), 1):
+        if value >= 0:
+          samples[family].append('{}{{{},channel="{}"}} {}\n'.format(family, labels, channel, value))
+
+  counters = metrics.counters
+  samples['omnik_polls'].append('omnik_polls_total{{{}}} {}\n'.format(labels, counters['polls']))
+  samples['omnik_poll_successes'].append('omnik_poll_successes_total{{{}}} {}\n'.format(labels, counters['successes']))
+  for cause in FAILURE_COUNTERS:
+    samples['omnik_poll_failures'].append(
+      'omnik_poll_failures_total{{{},cause="{}"}} {}\n'.format(labels, cause, counters[cause]))
+  for kind, counter in FRAME_COUNTERS:
+    samples['omnik_frames'].append('omnik_frames_total{{{},kind="{}"}} {}\n'.format(labels, kind, counters[counter]))
+  histogram = metrics.histograms['total']
+  if histogram.count:
+    for fraction in PERCENTILES:
+      samples['omnik_poll_duration_seconds'].append('omnik_poll_duration_seconds{{{},quantile="{}"}} {:.4f}\n'.format(
+        labels, fraction, histogram.percentile(fraction)))
+
+  return {family: ''.join(lines) for family, lines in samples.items()}
+
+class OmnikExporterProtocol(asyncio.Protocol):
+  """ HTTP connection of a scraper. """
+
+  def __init__(self, exporter):
+    """ Initialize the connection. """
+    self._exporter = exporter
+    self._transport = None
+    self._buffer = bytearray()
+
+  def connection_made(self, transport):
+    """ Keep the transport to answer the request. """
+    self._transport = transport
+    self._exporter.transports.add(transport)
+
+  def connection_lost(self, exc):
+    """ Forget the closed connection. """
+    self._exporter.transports.discard(self._transport)
+
+  def data_received(self, data):
+    """ Answer the request once its headers have been received. """
+    buffer = self._buffer
+    buffer += data
+    if b'\r\n\r\n' not in buffer:
+      if len(buffer) > REQUEST_MAX_SIZE:
+        self._transport.close()
+      return
+
+    request_line = bytes(buffer[:buffer.find(b'\r\n')]).split()
+    del buffer[:]
+    if len(request_line) == 3 and request_line[0] == b'GET' and request_line[1].split(b'?')[0] == EXPORTER_PATH:
+      self._transport.write(self._exporter.response)
+    else:
+      self._transport.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+    self._transport.close()
+
+class OmnikExporter():
+  """ HTTP server which serves the metrics of all inverters. """
+
+  def __init__(self, host, port):
+    """
+      Initialize the exporter.
+
+      Args:
+        host (str): address to listen on, or None for all addresses
+        port (int): TCP port to listen on
+    """
+    self._host = host
+    self._port = port
+    self._server = None
+    self._blocks = []
+    self.transports = set()
+    self.response = b''
+    self._render_response()
+
+  def add(self, name, data):
+    """
+      Add an inverter to the exported metrics.
+
+      Args:
+        name (str): name of the inverter
+        data (OmnikData): data of the inverter
+      Returns:
+        callable: to be called after each poll of the inverter
+    """
+    index = len(self._blocks)
+    self._blocks.append(render_inverter(name, data))
+    self._render_response()
+
+    def update():
+      """ Render the metrics of the inverter after a poll. """
+      self._blocks[index] = render_inverter(name, data)
+      self._render_response()
+
+    return update
+
+  def _render_response(self):
+    """ Render the complete response for all inverters. """
+    parts = []
+    for family, type, unit, text in FAMILIES:
+      parts.append('# TYPE {} {}\n'.format(family, type))
+      if unit is not None:
+        parts.append('# UNIT {} {}\n'.format(family, unit))
+      parts.append('# HELP {} {}\n'.format(family, text))
+      parts.extend(block[family] for block in self._blocks)
+    parts.append('# EOF\n')
+    body = ''.join(parts).encode()
+    self.response = ('HTTP/1.1 200 OK\r\nContent-Type: {}\r\nContent-Length: {}\r\nConnection: close\r\n\r\n'.format(
+      CONTENT_TYPE, len(body))).encode() + body
+
+  async def async_start(self):
+    """ Start accepting connections. """
+    loop = asyncio.get_running_loop()
+    self._server = await loop.create_server(lambda: OmnikExporterProtocol(self), self._host, self._port)
+    _LOGGER.debug('Exporter listening on port %s', self._port)
+
+  async def async_stop(self):
+    """ Stop accepting connections and close the open ones. """
+    for transport in list(self.transports):
+      transport.close()
+    if self._server is not None:
+      self._server.close()
+      await self._server.wait_closed()
+      self._server = None
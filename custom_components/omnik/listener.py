@@ -0,0 +1,110 @@
+"""
+  Listener for frames pushed by the Wi-Fi loggers.
+
+  Omnik/Trannergy loggers can be configured to send their statistics frames to
+  a remote server. The listener accepts these connections from any number of
+  loggers and routes every frame to the inverter it belongs to, by the
+  inverter serial number at offset 15-31 of the frame. The serial numbers of
+  the inverters are not configured, so the first frame of an inverter is
+  routed by the serial number of the logger in the frame header, after which
+  its inverter serial number is known.
+"""
+
+import asyncio
+import logging
+
+from .const import FRAME_LAYOUT_END, FRAME_LAYOUT_OFFSET
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_LISTEN_PORT = 10004
+LISTEN_IDLE_TIMEOUT = 900
+LISTEN_READ_SIZE = 1024
+
+class OmnikListener():
+  """ TCP server which receives the frames pushed by the loggers. """
+
+  def __init__(self, host, port, parser_factory):
+    """
+      Initialize the listener.
+
+      Args:
+        host (str): address to listen on, or None for all addresses
+        port (int): TCP port to listen on
+        parser_factory (callable): creates a frame parser per connection
+    """
+    self._host = host
+    self._port = port
+    self._parser_factory = parser_factory
+    self._server = None
+    self._writers = set()
+    self._loggers = {}
+    self._routes = {}
+    self.unrouted = 0
+
+  def register(self, logger_serial, handler):
+    """
+      Register the handler for the frames of a logger.
+
+      Args:
+        logger_serial (int): serial number of the Wi-Fi logger
+        handler (callable): called with every frame of the inverter
+    """
+    self._loggers[logger_serial] = handler
+
+  async def async_start(self):
+    """ Start accepting connections. """
+    self._server = await asyncio.start_server(self._async_handle_connection, self._host, self._port)
+    _LOGGER.debug('Listening for pushed frames on port %s', self._port)
+
+  async def async_stop(self):
+    """ Stop accepting connections and close the open ones. """
+    if self._server is not None:
+      self._server.close()
+    for writer in list(self._writers):
+      writer.close()
+    if self._server is not None:
+      await self._server.wait_closed()
+      self._server = None
+
+  async def _async_handle_connection(self, reader, writer):
+    """ Receive the frames of one connection until it is closed or idle. """
+    peer = writer.get_extra_info('peername')
+    parser = self._parser_factory()
+    self._writers.add(writer)
+    try:
+      while True:
+        data = await asyncio.wait_for(reader.read(LISTEN_READ_SIZE), LISTEN_IDLE_TIMEOUT)
+        if not data:
+          break
+        for frame in parser.feed(data):
+          self._route(frame, peer)
+    except (OSError, asyncio.TimeoutError):
+      _LOGGER.debug('Connection from %s is lost or idle', peer)
+    finally:
+      self._writers.discard(writer)
+      writer.close()
+
+  def _route(self, frame, peer):
+    """ Pass a frame to the handler of its inverter. """
+    if len(frame) < FRAME_LAYOUT_END:
+      """ Acknowledgements and other short messages carry no statistics. """
+      return
+
+    try:
+      inverter_sn = frame[FRAME_LAYOUT_OFFSET:FRAME_LAYOUT_OFFSET + 16].decode()
+    except UnicodeDecodeError:
+      inverter_sn = None
+
+    handler = self._routes.get(inverter_sn)
+    if handler is None:
+      logger_serial = int.from_bytes(frame[4:8], 'little')
+      handler = self._loggers.get(logger_serial)
+      if handler is None:
+        self.unrouted += 1
+        _LOGGER.debug('Frame from %s for unknown logger %s and inverter %s', peer, logger_serial, inverter_sn)
+        return
+      if inverter_sn is not None:
+        self._routes[inverter_sn] = handler
+
+    handler(frame)
@@ -0,0 +1,125 @@
+"""
+  Instrumentation of the polls of an inverter.
+
+  The duration of every phase of a poll is recorded in a histogram with
+  logarithmic buckets over a rolling window of the last polls, which takes a
+  fixed amount of memory and gives the percentiles within 10%. Failures are
+  counted by their cause.
+"""
+
+import math
+from array import array
+from bisect import bisect_left
+
+PHASES = ('dns', 'connect', 'send', 'receive', 'decode', 'total')
+COUNTERS = ('polls', 'successes', 'timeouts', 'refused', 'dns_failures', 'connection_errors',
+            'invalid_frames', 'short_frames', 'offline_frames')
+PERCENTILES = (0.5, 0.95, 0.99)
+
+LATENCY_WINDOW = 200
+
+""" Upper bounds of the buckets in seconds: 8 buckets per doubling, from 0.5 ms to 32 s. """
+HISTOGRAM_BOUNDS = tuple(0.0005 * 2 ** (index / 8) for index in range(129))
+
+class OmnikLatencyHistogram():
+  """ Histogram of the durations of the last polls. """
+
+  def __init__(self, window=LATENCY_WINDOW):
+    """
+      Initialize the histogram.
+
+      Args:
+        window (int): number of durations kept (Default: 200)
+    """
+    self._counts = array('I', [0]) * (len(HISTOGRAM_BOUNDS) + 1)
+    self._buckets = array('B', [0]) * window
+    self._window = window
+    self._index = 0
+    self.count = 0
+
+  def add(self, seconds):
+    """ Add a duration, replacing the oldest once the window is full. """
+    bucket = bisect_left(HISTOGRAM_BOUNDS, seconds)
+    index = self._index
+    if self.count == self._window:
+      self._counts[self._buckets[index]] -= 1
+    else:
+      self.count += 1
+    self._buckets[index] = bucket
+    self._counts[bucket] += 1
+    self._index = (index + 1) % self._window
+
+  def percentile(self, fraction):
+    """
+      Return a percentile of the durations.
+
+      Args:
+        fraction (float): the percentile as a fraction, for example 0.95
+      Returns:
+        float: upper bound of the bucket with the percentile in seconds (at
+          most 32 s), or None without durations
+    """
+    if self.count == 0:
+      return None
+    rank = max(math.ceil(fraction * self.count), 1)
+    for bucket, count in enumerate(self._counts):
+      rank -= count
+      if rank <= 0:
+        break
+    return HISTOGRAM_BOUNDS[min(bucket, len(HISTOGRAM_BOUNDS) - 1)]
+
+class OmnikPollMetrics():
+  """ Timings and failure counters of the polls of one inverter. """
+
+  def __init__(self, window=LATENCY_WINDOW):
+    """ Initialize the metrics. """
+    self.histograms = {phase: OmnikLatencyHistogram(window) for phase in PHASES}
+    self.counters = dict.fromkeys(COUNTERS, 0)
+    self.last = dict.fromkeys(PHASES)
+
+  def start(self):
+    """ Start recording a new poll. """
+    last = self.last
+    for phase in PHASES:
+      last[phase] = None
+    self.counters['polls'] += 1
+
+  def record(self, phase, seconds):
+    """ Record the duration of a phase; repeated phases within a poll add up. """
+    last = self.last[phase]
+    self.last[phase] = seconds if last is None else last + seconds
+
+  def count(self, counter, increment=1):
+    """ Increase a failure counter. """
+    self.counters[counter] += increment
+
+  def finish(self, seconds, success):
+    """ Add the durations of the finished poll to the histograms. """
+    self.record('total', seconds)
+    if success:
+      self.counters['successes'] += 1
+    for phase, duration in self.last.items():
+      if duration is not None:
+        self.histograms[phase].add(duration)
+
+  def get_latency(self, fraction, phase='total'):
+    """ Return a percentile of the duration of a phase in milliseconds. """
+    seconds = self.histograms[phase].percentile(fraction)
+    return None if seconds is None else round(seconds * 1000, 1)
+
+  def get_value(self, key):
+    """ Return a counter, or a percentile of the poll duration in milliseconds as `latency_p95`. """
+    if key in self.counters:
+      return self.counters[key]
+    return self.get_latency(int(key[len('latency_p'):]) / 100)
+
+  def get_diagnostics(self):
+    """ Return the counters, the last timings and the percentiles in milliseconds. """
+    return {
+      'counters': dict(self.counters),
+      'last': {phase: None if seconds is None else round(seconds * 1000, 1) for phase, seconds in self.last.items()},
+      'percentiles': {
+        phase: {'p{}'.format(round(fraction * 100)): self.get_latency(fraction, phase) for fraction in PERCENTILES}
+        for phase in PHASES
+      },
+    }
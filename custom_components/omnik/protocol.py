@@ -0,0 +1,118 @@
+"""
+  Protocol of the Omnik/Trannergy Wi-Fi loggers.
+
+  Building the statistics request and splitting received data into frames.
+  This module does not depend on Home Assistant, so tools such as the
+  simulator can use it on their own.
+"""
+
+import logging
+
+from .const import FRAME_END, FRAME_HEADER_SIZE, FRAME_OVERHEAD, FRAME_START
+
+_LOGGER = logging.getLogger(__name__)
+
+def generate_request(serial_number):
+  """
+    Create request string for inverter.
+    The request string is build from several parts. The first part is a fixed
+    4 char string; the second part is the reversed hex notation of the
+    serial number twice; then again a fixed string of two chars; a checksum of
+    the double serial number with an offset; and finally a fixed ending char.
+
+    Arguments:
+      serial_no (integer): Serial number of the inverter
+    Returns:
+      string: Information request string for inverter
+  """
+
+  """ Convert the serial number into a bytes array. """
+  double_hex = hex(serial_number)[2:] * 2
+  serial_bytes = bytearray.fromhex(double_hex)
+  serial_bytes.reverse()
+
+  cs_count = 115 + sum(serial_bytes)
+  checksum = bytearray.fromhex(hex(cs_count)[-2:])
+
+  """ Construct the message which requests the statistics. """
+  request_data = bytearray([0x68, 0x02, 0x40, 0x30])
+  request_data.extend(serial_bytes)
+  request_data.extend([0x01, 0x00])
+  request_data.extend(checksum)
+  request_data.append(0x16)
+
+  if _LOGGER.isEnabledFor(logging.DEBUG):
+    _LOGGER.debug('Request: %s', request_data.hex(' '))
+  return request_data
+
+class OmnikFrameParser():
+  """
+    Incremental parser which splits the data received from the inverter into
+    frames.
+
+    A frame starts with 0x68, followed by the payload length, two control
+    bytes, the logger serial number twice, the payload, a checksum over all
+    bytes after the start byte and finally 0x16. Data is collected in a
+    reusable buffer until the declared length has arrived, so a frame which
+    is split over several reads is reassembled. A start byte without the
+    serial number repeated behind it is skipped immediately, so a stray 0x68
+    in garbage does not hold up the frame behind it. Frames with a wrong
+    checksum or end byte are skipped.
+  """
+
+  def __init__(self):
+    """ Initialize the frame parser. """
+    self._buffer = bytearray()
+    self.rejected = 0
+
+  def reset(self):
+    """ Discard any partially received data. """
+    del self._buffer[:]
+
+  def feed(self, data):
+    """
+      Add received data to the buffer and extract the complete frames.
+
+      Args:
+        data (bytes): data received from the inverter
+      Returns:
+        list: the valid frames, in order of arrival
+    """
+    buffer = self._buffer
+    buffer += data
+    size = len(buffer)
+    frames = []
+    pos = 0
+
+    with memoryview(buffer) as view:
+      while True:
+        start = buffer.find(FRAME_START, pos)
+        if start < 0:
+          pos = size
+          break
+
+        """ Wait for the header, and skip start bytes without a plausible header. """
+        if start + FRAME_HEADER_SIZE > size:
+          pos = start
+          break
+        if view[start + 4:start + 8] != view[start + 8:start + 12]:
+          self.rejected += 1
+          pos = start + 1
+          continue
+
+        """ Wait for the rest of the frame. """
+        end = start + buffer[start + 1] + FRAME_OVERHEAD
+        if end > size:
+          pos = start
+          break
+
+        if buffer[end - 1] == FRAME_END and sum(view[start + 1:end - 2]) & 0xFF == buffer[end - 2]:
+          frames.append(bytes(view[start:end]))
+          pos = end
+        else:
+          """ Not a valid frame, resynchronize on the next start byte. """
+          self.rejected += 1
+          pos = start + 1
+
+    del buffer[:pos]
+    return frames
@@ -0,0 +1,119 @@
+"""
+  Caching proxy of the native protocol of the Wi-Fi loggers.
+
+  The loggers handle concurrent clients badly. The proxy lets other tools
+  share the polls of Home Assistant: it accepts the same statistics requests
+  as a logger, and answers them from the latest frame received from that
+  logger, without contacting the logger itself. A request for an unknown
+  logger, or for a logger without a recent frame, is not answered, just like
+  a logger which is offline.
+"""
+
+import asyncio
+import logging
+import time
+
+from .const import FRAME_END, FRAME_START
+
+_LOGGER = logging.getLogger(__name__)
+
+REQUEST_SIZE = 16
+PROXY_MAX_AGE = 600
+
+class OmnikProxyProtocol(asyncio.Protocol):
+  """ Connection of a client of the proxy. """
+
+  def __init__(self, proxy):
+    """ Initialize the connection. """
+    self._proxy = proxy
+    self._transport = None
+    self._buffer = bytearray()
+
+  def connection_made(self, transport):
+    """ Keep the transport to answer the requests. """
+    self._transport = transport
+    self._proxy.transports.add(transport)
+
+  def connection_lost(self, exc):
+    """ Forget the closed connection. """
+    self._proxy.transports.discard(self._transport)
+
+  def data_received(self, data):
+    """ Answer every complete request in the received data. """
+    buffer = self._buffer
+    buffer += data
+    pos = 0
+    while True:
+      start = buffer.find(FRAME_START, pos)
+      if start < 0:
+        pos = len(buffer)
+        break
+      if start + REQUEST_SIZE > len(buffer):
+        pos = start
+        break
+      if buffer[start + REQUEST_SIZE - 1] != FRAME_END or buffer[start + 4:start + 8] != buffer[start + 8:start + 12]:
+        """ Not a request, resynchronize on the next start byte. """
+        pos = start + 1
+        continue
+
+      frame = self._proxy.get_frame(int.from_bytes(buffer[start + 4:start + 8], 'little'))
+      if frame is not None:
+        self._transport.write(frame)
+      pos = start + REQUEST_SIZE
+    del buffer[:pos]
+
+class OmnikProxy():
+  """ TCP server which answers statistics requests from the cached frames. """
+
+  def __init__(self, host, port, max_age=PROXY_MAX_AGE):
+    """
+      Initialize the proxy.
+
+      Args:
+        host (str): address to listen on, or None for all addresses
+        port (int): TCP port to listen on
+        max_age (float): age in seconds after which a frame is not served
+    """
+    self._host = host
+    self._port = port
+    self._max_age = max_age
+    self._server = None
+    self.transports = set()
+    self._frames = {}
+    self.requests = 0
+    self.misses = 0
+
+  def update(self, logger_serial, frame, timestamp):
+    """
+      Keep the latest frame of a logger.
+
+      Args:
+        logger_serial (int): serial number of the Wi-Fi logger
+        frame (bytes): the frame as received from the logger
+        timestamp (float): time the frame was received in seconds since the epoch
+    """
+    self._frames[logger_serial] = (timestamp, frame)
+
+  def get_frame(self, logger_serial):
+    """ Return the latest frame of a logger, or None without a recent frame. """
+    self.requests += 1
+    cached = self._frames.get(logger_serial)
+    if cached is None or time.time() - cached[0] > self._max_age:
+      self.misses += 1
+      return None
+    return cached[1]
+
+  async def async_start(self):
+    """ Start accepting connections. """
+    loop = asyncio.get_running_loop()
+    self._server = await loop.create_server(lambda: OmnikProxyProtocol(self), self._host, self._port)
+    _LOGGER.debug('Proxy listening on port %s', self._port)
+
+  async def async_stop(self):
+    """ Stop accepting connections and close the open ones. """
+    for transport in list(self.transports):
+      transport.close()
+    if self._server is not None:
+      self._server.close()
+      await self._server.wait_closed()
+      self._server = None
@@ -0,0 +1,173 @@
+"""
+  High-rate sampling of inverter values for long-term statistics.
+
+  Instead of recording every poll as a state, the sampled values of a poll are
+  kept in a fixed-size in-memory buffer. When an hour has passed, the mean,
+  minimum and maximum of every value are computed in one pass over the
+  buffer, for the hour as well as for each 5 minutes of it, and the hourly
+  statistics are imported into the long-term statistics of Home Assistant as
+  external statistics `omnik:<serial>_<sensor>`.
+"""
+
+import logging
+import math
+from array import array
+from datetime import datetime, timezone
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SAMPLED_SENSOR_TYPES = ['actualpower', 'energytotal']
+SAMPLED_SENSOR_TYPES.extend('{}{}'.format(field, channel)
+                            for field in ('dcinputvoltage', 'dcinputcurrent', 'acoutputvoltage',
+                                          'acoutputcurrent', 'acoutputfrequency', 'acoutputpower')
+                            for channel in range(1, 4))
+
+""" Sensor types which are meter readings instead of measurements. """
+CUMULATIVE_SENSOR_TYPES = ['energytotal']
+
+HOUR = 3600
+FIVE_MINUTES = 300
+
+class OmnikSampler():
+  """ Buffer of the sampled values of one inverter during the current hour. """
+
+  def __init__(self, capacity):
+    """
+      Initialize the sampler.
+
+      Args:
+        capacity (int): number of samples kept; when more samples arrive within
+          an hour the oldest are overwritten
+    """
+    self._capacity = capacity
+    self._times = array('d', [math.nan]) * capacity
+    self._values = {type: array('d', [math.nan]) * capacity for type in SAMPLED_SENSOR_TYPES}
+    self._index = 0
+    self._count = 0
+    self._hour_start = None
+    self.five_minutes = []
+
+  def add(self, timestamp, sensor_data):
+    """
+      Add the values of a poll.
+
+      Args:
+        timestamp (float): time of the poll in seconds since the epoch
+        sensor_data (dict): values of the poll, per sensor type
+      Returns:
+        dict: aggregates of the previous hour once it has passed, else None
+    """
+    completed = None
+    hour_start = timestamp - timestamp % HOUR
+    if self._hour_start is not None and hour_start != self._hour_start:
+      completed = self.aggregate()
+      self._index = 0
+      self._count = 0
+    self._hour_start = hour_start
+
+    index = self._index
+    self._times[index] = timestamp
+    for type, values in self._values.items():
+      value = sensor_data.get(type)
+      values[index] = math.nan if value is None or value < 0 else value
+    self._index = (index + 1) % self._capacity
+    self._count = min(self._count + 1, self._capacity)
+
+    return completed
+
+  def aggregate(self):
+    """
+      Aggregate the samples of the current hour in one pass.
+
+      Returns:
+        dict: start of the hour, and per sensor type a tuple of mean, minimum,
+          maximum and last value of the hour (or None without samples)
+    """
+    hour_start = self._hour_start
+    buckets = HOUR // FIVE_MINUTES
+    hour = {}
+    five_minutes = [{} for _ in range(buckets)]
+
+    times = self._times
+    order = sorted(range(self._count), key=times.__getitem__)
+    for type, values in self._values.items():
+      total = count = 0
+      minimum = maximum = last = None
+      bucket_totals = [0.0] * buckets
+      bucket_counts = [0] * buckets
+      bucket_minimums = [None] * buckets
+      bucket_maximums = [None] * buckets
+
+      for index in order:
+        value = values[index]
+        if value != value:
+          continue
+        bucket = min(int((times[index] - hour_start) // FIVE_MINUTES), buckets - 1)
+        total += value
+        count += 1
+        last = value
+        if minimum is None or value < minimum:
+          minimum = value
+        if maximum is None or value > maximum:
+          maximum = value
+        bucket_totals[bucket] += value
+        bucket_counts[bucket] += 1
+        if bucket_minimums[bucket] is None or value < bucket_minimums[bucket]:
+          bucket_minimums[bucket] = value
+        if bucket_maximums[bucket] is None or value > bucket_maximums[bucket]:
+          bucket_maximums[bucket] = value
+
+      hour[type] = (total / count, minimum, maximum, last) if count else None
+      for bucket in range(buckets):
+        five_minutes[bucket][type] = None
+        if bucket_counts[bucket]:
+          five_minutes[bucket][type] = (bucket_totals[bucket] / bucket_counts[bucket],
+                                        bucket_minimums[bucket], bucket_maximums[bucket])
+
+    self.five_minutes = five_minutes
+    return {'start': hour_start, 'hour': hour, 'five_minutes': five_minutes}
+
+def async_import_statistics(hass, inverter_sn, names, units, hours):
+  """
+    Import the aggregates of completed hours into the long-term statistics.
+
+    All hours are imported in one batch per sensor type.
+
+    Args:
+      hass (HomeAssistant): Home Assistant instance
+      inverter_sn (int): serial number, used in the statistic id
+      names (dict): name per sensor type
+      units (dict): unit of measurement per sensor type
+      hours (list): aggregates as returned by OmnikSampler.aggregate
+  """
+  from homeassistant.components.recorder.statistics import async_add_external_statistics
+
+  for type in SAMPLED_SENSOR_TYPES:
+    cumulative = type in CUMULATIVE_SENSOR_TYPES
+    statistics = []
+    for aggregates in hours:
+      values = aggregates['hour'][type]
+      if values is None:
+        continue
+      mean, minimum, maximum, last = values
+      start = datetime.fromtimestamp(aggregates['start'], timezone.utc)
+      if cumulative:
+        statistics.append({'start': start, 'state': last, 'sum': last})
+      else:
+        statistics.append({'start': start, 'mean': mean, 'min': minimum, 'max': maximum})
+
+    if not statistics:
+      continue
+
+    metadata = {
+      'has_mean': not cumulative,
+      'has_sum': cumulative,
+      'name': names[type],
+      'source': DOMAIN,
+      'statistic_id': '{}:{}_{}'.format(DOMAIN, inverter_sn, type),
+      'unit_of_measurement': units[type],
+    }
+    async_add_external_statistics(hass, metadata, statistics)
+    _LOGGER.debug('Imported %d hours of %s statistics for %s', len(statistics), type, inverter_sn)
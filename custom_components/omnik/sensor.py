@@ -6,13 +6,21 @@
   For more information: https://github.com/josh-sanders/home_assistant_omnik_solar/
 """
 
+import asyncio
 import logging
-from datetime import timedelta
+import os
+import random
+import socket
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
 
 import voluptuous as vol
 
 from homeassistant.components.sensor import (
     PLATFORM_SCHEMA,
+    RestoreSensor,
     SensorDeviceClass,
     SensorEntity,
     SensorStateClass,
@@ -21,50 +29,181 @@ from homeassistant.const import (
     EVENT_HOMEASSISTANT_STOP,
     CONF_NAME,
     CONF_SCAN_INTERVAL,
+    EntityCategory,
 )
+from homeassistant.core import callback
 import homeassistant.helpers.config_validation as cv
-from homeassistant.util import Throttle
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.sun import is_up
+from homeassistant.helpers.update_coordinator import (
+    CoordinatorEntity,
+    DataUpdateCoordinator,
+)
 
-import socket
-import struct
+from .aggregates import DERIVED_SENSOR_TYPES, OmnikAggregator
+from .capture import DEFAULT_CAPTURE_MAX_RECORDS, OmnikCaptureLog
+from .const import (
+    DATA_COORDINATORS,
+    DEFAULT_PORT_INVERTER,
+    DOMAIN,
+    FRAME_LAYOUT,
+    FRAME_LAYOUT_END,
+    FRAME_LAYOUT_OFFSET,
+)
+from .exporter import DEFAULT_EXPORTER_PORT, OmnikExporter
+from .listener import DEFAULT_LISTEN_PORT, OmnikListener
+from .metrics import OmnikPollMetrics
+from .protocol import OmnikFrameParser, generate_request
+from .proxy import OmnikProxy
+from .sampling import HOUR, SAMPLED_SENSOR_TYPES, OmnikSampler, async_import_statistics
 
 _LOGGER = logging.getLogger(__name__)
 
-DEFAULT_PORT_INVERTER = 8899
+CONNECT_TIMEOUT = timedelta(seconds=3)
+READ_TIMEOUT = timedelta(seconds=3)
+POLL_TIMEOUT = timedelta(seconds=15)
+ADAPTIVE_TIMEOUT_FACTOR = 4
+ADAPTIVE_TIMEOUT_MIN = 0.5
+ADAPTIVE_TIMEOUT_SAMPLES = 20
+DNS_CACHE_TTL = timedelta(minutes=5)
+DNS_RETRY_DELAY = 60
+READ_SIZE = 1024
+REQUEST_ATTEMPTS = 3
+RECONNECT_DELAY_MIN = 1
+RECONNECT_DELAY_MAX = 300
+DEFAULT_MAX_CONCURRENT_POLLS = 4
+POLL_JITTER = 0.1
+BREAKER_FAILURE_THRESHOLD = 3
+BREAKER_RETRY_DELAY_MIN = 30
+BREAKER_RETRY_DELAY_MAX = 900
+FRAME_LOG_SIZE = 20
+PENDING_HOURS_MAX = 24
 MIN_TIME_BETWEEN_UPDATES = timedelta(seconds=5)
+SCAN_INTERVAL = timedelta(seconds=30)
+MAX_SCAN_INTERVAL = timedelta(minutes=10)
+HEARTBEAT_INTERVAL = timedelta(minutes=5)
+STATE_INTERVAL = timedelta(minutes=5)
+PUSH_TIMEOUT = timedelta(minutes=15)
+POWER_CHANGE_MIN = 100
+POWER_CHANGE_RATIO = 0.1
 
 CONF_INVERTER_HOST = 'inverter_host'
 CONF_INVERTER_PORT = 'inverter_port'
 CONF_INVERTER_SERIAL = 'inverter_serial'
+CONF_PERSISTENT_CONNECTION = 'persistent_connection'
+CONF_CONNECT_TIMEOUT = 'connect_timeout'
+CONF_READ_TIMEOUT = 'read_timeout'
+CONF_POLL_TIMEOUT = 'poll_timeout'
+CONF_ADAPTIVE_TIMEOUTS = 'adaptive_timeouts'
+CONF_DNS_CACHE_TTL = 'dns_cache_ttl'
+CONF_INVERTERS = 'inverters'
+CONF_MAX_CONCURRENT_POLLS = 'max_concurrent_polls'
+CONF_ADAPTIVE_POLLING = 'adaptive_polling'
+CONF_MIN_SCAN_INTERVAL = 'min_scan_interval'
+CONF_MAX_SCAN_INTERVAL = 'max_scan_interval'
+CONF_DEADBANDS = 'deadbands'
+CONF_ABSOLUTE = 'absolute'
+CONF_RELATIVE = 'relative'
+CONF_HEARTBEAT_INTERVAL = 'heartbeat_interval'
+CONF_CAPTURE_DIRECTORY = 'capture_directory'
+CONF_CAPTURE_MAX_RECORDS = 'capture_max_records'
+CONF_HIGH_RATE_STATISTICS = 'high_rate_statistics'
+CONF_STATE_INTERVAL = 'state_interval'
+CONF_LISTEN = 'listen'
+CONF_LISTEN_HOST = 'listen_host'
+CONF_LISTEN_PORT = 'listen_port'
+CONF_PUSH_TIMEOUT = 'push_timeout'
+CONF_PROXY = 'proxy'
+CONF_PROXY_HOST = 'proxy_host'
+CONF_PROXY_PORT = 'proxy_port'
+CONF_EXPORTER = 'exporter'
+CONF_EXPORTER_HOST = 'exporter_host'
+CONF_EXPORTER_PORT = 'exporter_port'
+CONF_DIAGNOSTIC_SENSORS = 'diagnostic_sensors'
 CONF_SENSORS = 'sensors'
 
+ATTR_STALE = 'stale'
+ATTR_UNIT = '{} unit'
+
 SENSOR_PREFIX = 'Omnik'
+SITE_SENSOR_TYPES = ['actualpower', 'energytoday', 'energytotal']
+
+@dataclass(frozen=True, slots=True)
+class OmnikSensorDescription():
+  """ Description of a sensor type, with the default deadbands of numeric types. """
+
+  name: str
+  unit: str | None
+  icon: str
+  device_class: SensorDeviceClass | None
+  state_class: SensorStateClass | None
+  deadband: float | None
+  relative_deadband: float | None
+
+  @property
+  def numeric(self):
+    """ Whether the values are numbers. """
+    return self.deadband is not None
+
+  @property
+  def keeps_last_value(self):
+    """ Whether the last known value is kept while the inverter is offline. """
+    return self.state_class == SensorStateClass.TOTAL_INCREASING
+
 SENSOR_TYPES = {
-  'status':             ['Status',                 None,  'mdi:weather-sunny',               None,                          None],
-  'actualpower':        ['Actual Power',           'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT],
-  'energytoday':        ['Energy Today',           'kWh', 'mdi:chart-bell-curve-cumulative', SensorDeviceClass.ENERGY,      SensorStateClass.TOTAL_INCREASING],
-  'energytotal':        ['Energy Total',           'kWh', 'mdi:meter-electric-outline',      SensorDeviceClass.ENERGY,      SensorStateClass.TOTAL_INCREASING],
-  'hourstotal':         ['Hours Total',            'h',   'mdi:timer-outline',               SensorDeviceClass.DURATION,    SensorStateClass.TOTAL_INCREASING],
-  'invertersn':         ['Inverter Serial Number', None,  'mdi:information-outline',         None,                          None],
-  'temperature':        ['Temperature',            '°C',  'mdi:thermometer',                 SensorDeviceClass.TEMPERATURE, SensorStateClass.MEASUREMENT],
-  'dcinputvoltage1':    ['DC Input Voltage 1',     'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT],
-  'dcinputcurrent1':    ['DC Input Current 1',     'A',   'mdi:current-dc',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT],
-  'dcinputvoltage2':    ['DC Input Voltage 2',     'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT],
-  'dcinputcurrent2':    ['DC Input Current 2',     'A',   'mdi:current-dc',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT],
-  'dcinputvoltage3':    ['DC Input Voltage 3',     'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT],
-  'dcinputcurrent3':    ['DC Input Current 3',     'A',   'mdi:current-dc',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT],
-  'acoutputvoltage1':   ['AC Output Voltage 1',    'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT],
-  'acoutputcurrent1':   ['AC Output Current 1',    'A',   'mdi:current-ac',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT],
-  'acoutputfrequency1': ['AC Output Frequency 1',  'Hz',  'mdi:sine-wave',                   SensorDeviceClass.FREQUENCY,   SensorStateClass.MEASUREMENT],
-  'acoutputpower1':     ['AC Output Power 1',      'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT],
-  'acoutputvoltage2':   ['AC Output Voltage 2',    'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT],
-  'acoutputcurrent2':   ['AC Output Current 2',    'A',   'mdi:current-ac',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT],
-  'acoutputfrequency2': ['AC Output Frequency 2',  'Hz',  'mdi:sine-wave',                   SensorDeviceClass.FREQUENCY,   SensorStateClass.MEASUREMENT],
-  'acoutputpower2':     ['AC Output Power 2',      'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT],
-  'acoutputvoltage3':   ['AC Output Voltage 3',    'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT],
-  'acoutputcurrent3':   ['AC Output Current 3',    'A',   'mdi:current-ac',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT],
-  'acoutputfrequency3': ['AC Output Frequency 3',  'Hz',  'mdi:sine-wave',                   SensorDeviceClass.FREQUENCY,   SensorStateClass.MEASUREMENT],
-  'acoutputpower3':     ['AC Output Power 3',      'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT],
+  'status':                OmnikSensorDescription('Status',                  None,  'mdi:weather-sunny',               None,                          None,                              None, None),
+  'actualpower':           OmnikSensorDescription('Actual Power',            'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'energytoday':           OmnikSensorDescription('Energy Today',            'kWh', 'mdi:chart-bell-curve-cumulative', SensorDeviceClass.ENERGY,      SensorStateClass.TOTAL_INCREASING, 0,    0),
+  'energytotal':           OmnikSensorDescription('Energy Total',            'kWh', 'mdi:meter-electric-outline',      SensorDeviceClass.ENERGY,      SensorStateClass.TOTAL_INCREASING, 0,    0),
+  'hourstotal':            OmnikSensorDescription('Hours Total',             'h',   'mdi:timer-outline',               SensorDeviceClass.DURATION,    SensorStateClass.TOTAL_INCREASING, 0,    0),
+  'invertersn':            OmnikSensorDescription('Inverter Serial Number',  None,  'mdi:information-outline',         None,                          None,                              None, None),
+  'temperature':           OmnikSensorDescription('Temperature',             '°C',  'mdi:thermometer',                 SensorDeviceClass.TEMPERATURE, SensorStateClass.MEASUREMENT,      0.5,  0),
+  'dcinputvoltage1':       OmnikSensorDescription('DC Input Voltage 1',      'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT,      0.5,  0),
+  'dcinputcurrent1':       OmnikSensorDescription('DC Input Current 1',      'A',   'mdi:current-dc',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT,      0.05, 0),
+  'dcinputvoltage2':       OmnikSensorDescription('DC Input Voltage 2',      'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT,      0.5,  0),
+  'dcinputcurrent2':       OmnikSensorDescription('DC Input Current 2',      'A',   'mdi:current-dc',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT,      0.05, 0),
+  'dcinputvoltage3':       OmnikSensorDescription('DC Input Voltage 3',      'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT,      0.5,  0),
+  'dcinputcurrent3':       OmnikSensorDescription('DC Input Current 3',      'A',   'mdi:current-dc',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT,      0.05, 0),
+  'acoutputvoltage1':      OmnikSensorDescription('AC Output Voltage 1',     'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT,      0.5,  0),
+  'acoutputcurrent1':      OmnikSensorDescription('AC Output Current 1',     'A',   'mdi:current-ac',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT,      0.05, 0),
+  'acoutputfrequency1':    OmnikSensorDescription('AC Output Frequency 1',   'Hz',  'mdi:sine-wave',                   SensorDeviceClass.FREQUENCY,   SensorStateClass.MEASUREMENT,      0.05, 0),
+  'acoutputpower1':        OmnikSensorDescription('AC Output Power 1',       'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'acoutputvoltage2':      OmnikSensorDescription('AC Output Voltage 2',     'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT,      0.5,  0),
+  'acoutputcurrent2':      OmnikSensorDescription('AC Output Current 2',     'A',   'mdi:current-ac',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT,      0.05, 0),
+  'acoutputfrequency2':    OmnikSensorDescription('AC Output Frequency 2',   'Hz',  'mdi:sine-wave',                   SensorDeviceClass.FREQUENCY,   SensorStateClass.MEASUREMENT,      0.05, 0),
+  'acoutputpower2':        OmnikSensorDescription('AC Output Power 2',       'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'acoutputvoltage3':      OmnikSensorDescription('AC Output Voltage 3',     'V',   'mdi:flash-outline',               SensorDeviceClass.VOLTAGE,     SensorStateClass.MEASUREMENT,      0.5,  0),
+  'acoutputcurrent3':      OmnikSensorDescription('AC Output Current 3',     'A',   'mdi:current-ac',                  SensorDeviceClass.CURRENT,     SensorStateClass.MEASUREMENT,      0.05, 0),
+  'acoutputfrequency3':    OmnikSensorDescription('AC Output Frequency 3',   'Hz',  'mdi:sine-wave',                   SensorDeviceClass.FREQUENCY,   SensorStateClass.MEASUREMENT,      0.05, 0),
+  'acoutputpower3':        OmnikSensorDescription('AC Output Power 3',       'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'dcinputpower1':         OmnikSensorDescription('DC Input Power 1',        'W',   'mdi:solar-panel',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'dcinputpower2':         OmnikSensorDescription('DC Input Power 2',        'W',   'mdi:solar-panel',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'dcinputpower3':         OmnikSensorDescription('DC Input Power 3',        'W',   'mdi:solar-panel',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'dcinputpower':          OmnikSensorDescription('DC Input Power',          'W',   'mdi:solar-panel',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'efficiency':            OmnikSensorDescription('Efficiency',              '%',   'mdi:percent-outline',             None,                          SensorStateClass.MEASUREMENT,      0.5,  0),
+  'energytodayintegrated': OmnikSensorDescription('Energy Today Integrated', 'kWh', 'mdi:chart-bell-curve-cumulative', SensorDeviceClass.ENERGY,      SensorStateClass.TOTAL_INCREASING, 0,    0),
+  'actualpoweravg5m':      OmnikSensorDescription('Power Average 5 Minutes', 'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'actualpowermin5m':      OmnikSensorDescription('Power Minimum 5 Minutes', 'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'actualpowermax5m':      OmnikSensorDescription('Power Maximum 5 Minutes', 'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'actualpoweravg1h':      OmnikSensorDescription('Power Average 1 Hour',    'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'actualpowermin1h':      OmnikSensorDescription('Power Minimum 1 Hour',    'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+  'actualpowermax1h':      OmnikSensorDescription('Power Maximum 1 Hour',    'W',   'mdi:solar-power',                 SensorDeviceClass.POWER,       SensorStateClass.MEASUREMENT,      0,    0),
+}
+
+""" Sensors with the poll metrics of an inverter, see OmnikPollMetrics.get_value. """
+DIAGNOSTIC_SENSOR_TYPES = {
+  'latency_p50':       OmnikSensorDescription('Poll Latency p50',    'ms', 'mdi:timer-outline',        SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT,      None, None),
+  'latency_p95':       OmnikSensorDescription('Poll Latency p95',    'ms', 'mdi:timer-outline',        SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT,      None, None),
+  'latency_p99':       OmnikSensorDescription('Poll Latency p99',    'ms', 'mdi:timer-outline',        SensorDeviceClass.DURATION, SensorStateClass.MEASUREMENT,      None, None),
+  'polls':             OmnikSensorDescription('Polls',               None, 'mdi:counter',              None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'successes':         OmnikSensorDescription('Successful Polls',    None, 'mdi:check-network',        None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'timeouts':          OmnikSensorDescription('Timeouts',            None, 'mdi:timer-alert-outline',  None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'refused':           OmnikSensorDescription('Refused Connections', None, 'mdi:close-network',        None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'dns_failures':      OmnikSensorDescription('DNS Failures',        None, 'mdi:dns',                  None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'connection_errors': OmnikSensorDescription('Connection Errors',   None, 'mdi:lan-disconnect',       None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'invalid_frames':    OmnikSensorDescription('Invalid Frames',      None, 'mdi:alert-circle-outline', None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'short_frames':      OmnikSensorDescription('Short Frames',        None, 'mdi:alert-circle-outline', None,                       SensorStateClass.TOTAL_INCREASING, None, None),
+  'offline_frames':    OmnikSensorDescription('Offline Frames',      None, 'mdi:weather-night',        None,                       SensorStateClass.TOTAL_INCREASING, None, None),
 }
 
 def _check_config_schema(conf):
@@ -76,75 +215,411 @@ def _check_config_schema(conf):
       if(attr not in SENSOR_TYPES):
         raise vol.Invalid('attribute sensor {} does not exist [{}]'.format(attr, sensor))
 
+  for sensor in conf[CONF_DIAGNOSTIC_SENSORS]:
+    if(sensor not in DIAGNOSTIC_SENSOR_TYPES):
+      raise vol.Invalid('diagnostic sensor {} does not exist'.format(sensor))
+
+  for sensor in conf[CONF_DEADBANDS]:
+    if(sensor not in SENSOR_TYPES or not SENSOR_TYPES[sensor].numeric):
+      raise vol.Invalid('deadband sensor {} does not exist or is not numeric'.format(sensor))
+
+  if(CONF_INVERTERS in conf):
+    if(CONF_INVERTER_HOST in conf or CONF_INVERTER_SERIAL in conf):
+      raise vol.Invalid('use either [inverters] or [inverter_host] and [inverter_serial], not both')
+    if(not conf[CONF_LISTEN]):
+      for inverter in conf[CONF_INVERTERS]:
+        if(CONF_INVERTER_HOST not in inverter):
+          raise vol.Invalid('inverter {} does not have an [inverter_host]'.format(inverter[CONF_NAME]))
+
   return conf
 
+INVERTER_SCHEMA = vol.Schema({
+    vol.Required(CONF_NAME): cv.string,
+    vol.Optional(CONF_INVERTER_HOST): cv.string,
+    vol.Optional(CONF_INVERTER_PORT): cv.positive_int,
+    vol.Required(CONF_INVERTER_SERIAL): cv.positive_int,
+    vol.Optional(CONF_PERSISTENT_CONNECTION): cv.boolean,
+    vol.Optional(CONF_CONNECT_TIMEOUT): cv.time_period,
+    vol.Optional(CONF_READ_TIMEOUT): cv.time_period,
+    vol.Optional(CONF_POLL_TIMEOUT): cv.time_period,
+    vol.Optional(CONF_ADAPTIVE_TIMEOUTS): cv.boolean,
+})
+
 PLATFORM_SCHEMA = vol.All(PLATFORM_SCHEMA.extend({
     vol.Optional(CONF_NAME, default=SENSOR_PREFIX): cv.string,
-    vol.Optional(CONF_INVERTER_HOST, default=None): cv.string,
+    vol.Optional(CONF_INVERTER_HOST): cv.string,
     vol.Optional(CONF_INVERTER_PORT, default=DEFAULT_PORT_INVERTER): cv.positive_int,
-    vol.Optional(CONF_INVERTER_SERIAL, default=None): cv.positive_int,
+    vol.Optional(CONF_INVERTER_SERIAL): cv.positive_int,
+    vol.Optional(CONF_PERSISTENT_CONNECTION, default=False): cv.boolean,
+    vol.Optional(CONF_CONNECT_TIMEOUT, default=CONNECT_TIMEOUT): cv.time_period,
+    vol.Optional(CONF_READ_TIMEOUT, default=READ_TIMEOUT): cv.time_period,
+    vol.Optional(CONF_POLL_TIMEOUT, default=POLL_TIMEOUT): cv.time_period,
+    vol.Optional(CONF_ADAPTIVE_TIMEOUTS, default=False): cv.boolean,
+    vol.Optional(CONF_DNS_CACHE_TTL, default=DNS_CACHE_TTL): cv.time_period,
+    vol.Optional(CONF_INVERTERS): vol.All(cv.ensure_list, [INVERTER_SCHEMA]),
+    vol.Optional(CONF_MAX_CONCURRENT_POLLS, default=DEFAULT_MAX_CONCURRENT_POLLS): cv.positive_int,
+    vol.Optional(CONF_ADAPTIVE_POLLING, default=False): cv.boolean,
+    vol.Optional(CONF_MIN_SCAN_INTERVAL, default=MIN_TIME_BETWEEN_UPDATES): cv.time_period,
+    vol.Optional(CONF_MAX_SCAN_INTERVAL, default=MAX_SCAN_INTERVAL): cv.time_period,
+    vol.Optional(CONF_DEADBANDS, default={}): vol.Schema({cv.slug: vol.Schema({
+      vol.Optional(CONF_ABSOLUTE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+      vol.Optional(CONF_RELATIVE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    })}),
+    vol.Optional(CONF_HEARTBEAT_INTERVAL, default=HEARTBEAT_INTERVAL): cv.time_period,
+    vol.Optional(CONF_CAPTURE_DIRECTORY): cv.string,
+    vol.Optional(CONF_CAPTURE_MAX_RECORDS, default=DEFAULT_CAPTURE_MAX_RECORDS): cv.positive_int,
+    vol.Optional(CONF_HIGH_RATE_STATISTICS, default=False): cv.boolean,
+    vol.Optional(CONF_STATE_INTERVAL, default=STATE_INTERVAL): cv.time_period,
+    vol.Optional(CONF_LISTEN, default=False): cv.boolean,
+    vol.Optional(CONF_LISTEN_HOST): cv.string,
+    vol.Optional(CONF_LISTEN_PORT, default=DEFAULT_LISTEN_PORT): cv.port,
+    vol.Optional(CONF_PUSH_TIMEOUT, default=PUSH_TIMEOUT): cv.time_period,
+    vol.Optional(CONF_PROXY, default=False): cv.boolean,
+    vol.Optional(CONF_PROXY_HOST): cv.string,
+    vol.Optional(CONF_PROXY_PORT, default=DEFAULT_PORT_INVERTER): cv.port,
+    vol.Optional(CONF_EXPORTER, default=False): cv.boolean,
+    vol.Optional(CONF_EXPORTER_HOST): cv.string,
+    vol.Optional(CONF_EXPORTER_PORT, default=DEFAULT_EXPORTER_PORT): cv.port,
+    vol.Optional(CONF_DIAGNOSTIC_SENSORS, default=[]): vol.All(cv.ensure_list, [cv.string]),
     vol.Required(CONF_SENSORS): vol.Schema({cv.slug: cv.ensure_list}),
 }, extra=vol.PREVENT_EXTRA), _check_config_schema)
 
-def setup_platform(hass, config, add_devices, discovery_info=None):
+async def async_setup_platform(hass, config, async_add_entities, discovery_info=None):
   """ Set up Omnik sensor. """
-  inverter_name = config.get(CONF_NAME)
-  inverter_host = config.get(CONF_INVERTER_HOST)
-  inverter_port = config.get(CONF_INVERTER_PORT)
-  inverter_sn = config.get(CONF_INVERTER_SERIAL)
+  scan_interval = max(config.get(CONF_SCAN_INTERVAL, SCAN_INTERVAL), MIN_TIME_BETWEEN_UPDATES)
+  inverters = config.get(CONF_INVERTERS)
+  fleet = inverters is not None
+  listen = config[CONF_LISTEN]
 
-  """ Check input configuration. """
-  if(inverter_host == None):
-    raise vol.Invalid('configuration parameter [inverter_host] does not have a value')
-  if(inverter_sn == None):
-    raise vol.Invalid('configuration parameter [inverter_serial] does not have a value')
+  if not fleet:
+    """ Check input configuration. """
+    if(config.get(CONF_INVERTER_HOST) == None and not listen):
+      raise vol.Invalid('configuration parameter [inverter_host] does not have a value')
+    if(config.get(CONF_INVERTER_SERIAL) == None):
+      raise vol.Invalid('configuration parameter [inverter_serial] does not have a value')
+
+    inverters = [config]
 
   """ Determine for which sensors data should be retrieved. """
   used_sensors = []
   for type, subtypes in config[CONF_SENSORS].items():
     used_sensors.append(type)
     used_sensors.extend(subtypes)
+  if fleet:
+    used_sensors.extend(SITE_SENSOR_TYPES)
+  high_rate = config[CONF_HIGH_RATE_STATISTICS]
+  if high_rate:
+    used_sensors.extend(SAMPLED_SENSOR_TYPES)
+
+  """ Determine the deadbands within which changes are not written. """
+  deadbands = {}
+  for type, description in SENSOR_TYPES.items():
+    if description.numeric:
+      band = config[CONF_DEADBANDS].get(type, {})
+      deadbands[type] = (band.get(CONF_ABSOLUTE, description.deadband),
+                         band.get(CONF_RELATIVE, description.relative_deadband))
+  heartbeat = config[CONF_HEARTBEAT_INTERVAL].total_seconds()
+
+  """ With high-rate statistics the states are written at a lower rate. """
+  state_interval = config[CONF_STATE_INTERVAL].total_seconds() if high_rate else 0
+  min_interval = min(scan_interval, config[CONF_MIN_SCAN_INTERVAL]) if config[CONF_ADAPTIVE_POLLING] else scan_interval
+  sample_capacity = HOUR // int(max(min_interval, MIN_TIME_BETWEEN_UPDATES).total_seconds()) + 1
+
+  """ Limit the number of inverters which are polled at the same time. """
+  semaphore = asyncio.Semaphore(config[CONF_MAX_CONCURRENT_POLLS]) if fleet else None
+
+  """ In listen mode the loggers push their frames, and are not polled. """
+  listener = None
+  if listen:
+    listener = OmnikListener(config.get(CONF_LISTEN_HOST), config[CONF_LISTEN_PORT], OmnikFrameParser)
+    scan_interval = config[CONF_PUSH_TIMEOUT]
+
+  """ The proxy answers other clients from the frames of the polls. """
+  proxy = None
+  if config[CONF_PROXY]:
+    proxy = OmnikProxy(config.get(CONF_PROXY_HOST), config[CONF_PROXY_PORT])
+
+  """ The exporter serves the readings of all inverters to Prometheus. """
+  exporter = None
+  if config[CONF_EXPORTER]:
+    exporter = OmnikExporter(config.get(CONF_EXPORTER_HOST), config[CONF_EXPORTER_PORT])
+
+  coordinators = []
+  hass_sensors = []
+  for inverter in inverters:
+    inverter_name = inverter.get(CONF_NAME)
+    inverter_sn = inverter.get(CONF_INVERTER_SERIAL)
+    persistent = inverter.get(CONF_PERSISTENT_CONNECTION, config[CONF_PERSISTENT_CONNECTION])
+    deadlines = OmnikDeadlines(
+      inverter.get(CONF_CONNECT_TIMEOUT, config[CONF_CONNECT_TIMEOUT]).total_seconds(),
+      inverter.get(CONF_READ_TIMEOUT, config[CONF_READ_TIMEOUT]).total_seconds(),
+      inverter.get(CONF_POLL_TIMEOUT, config[CONF_POLL_TIMEOUT]).total_seconds(),
+      inverter.get(CONF_ADAPTIVE_TIMEOUTS, config[CONF_ADAPTIVE_TIMEOUTS]))
+
+    """ Initialize the Omnik data interface. """
+    data = OmnikData(inverter.get(CONF_INVERTER_HOST), inverter.get(CONF_INVERTER_PORT, config[CONF_INVERTER_PORT]),
+                     inverter_sn, used_sensors, persistent, deadlines, config[CONF_DNS_CACHE_TTL].total_seconds())
+    if CONF_CAPTURE_DIRECTORY in config:
+      data.capture = OmnikCaptureLog(
+        os.path.join(hass.config.path(config[CONF_CAPTURE_DIRECTORY]), '{}.frames'.format(inverter_sn)),
+        config[CONF_CAPTURE_MAX_RECORDS])
+
+    """ Fetch the data once per interval on behalf of all sensor entities. """
+    scheduler = None
+    if config[CONF_ADAPTIVE_POLLING] and not listen:
+      scheduler = OmnikPollScheduler(scan_interval,
+                                     max(config[CONF_MIN_SCAN_INTERVAL], MIN_TIME_BETWEEN_UPDATES),
+                                     max(config[CONF_MAX_SCAN_INTERVAL], scan_interval))
+    sampler = OmnikSampler(sample_capacity) if high_rate else None
+    coordinator = OmnikDataUpdateCoordinator(hass, inverter_name, data, scan_interval, semaphore, scheduler, sampler,
+                                             listen)
+    if listener is not None:
+      listener.register(inverter_sn, coordinator.async_handle_frame)
+    if proxy is not None:
+      coordinator.async_add_listener(coordinator.proxy_listener(proxy))
+    if exporter is not None:
+      coordinator.async_add_listener(exporter.add(inverter_name, data))
+    coordinators.append(coordinator)
+    hass.data.setdefault(DOMAIN, {}).setdefault(DATA_COORDINATORS, []).append(coordinator)
+
+    """ Prepare the sensor entities. """
+    for type, subtypes in config[CONF_SENSORS].items():
+      hass_sensors.append(OmnikSensor(inverter_name, inverter_sn, coordinator, type, subtypes, deadbands, heartbeat,
+                                      state_interval))
+    for type in config[CONF_DIAGNOSTIC_SENSORS]:
+      hass_sensors.append(OmnikDiagnosticSensor(inverter_name, inverter_sn, coordinator, type))
+
+  async def async_close_connection(event):
+    """ Close the connections to the inverters when Home Assistant stops. """
+    if listener is not None:
+      await listener.async_stop()
+    if proxy is not None:
+      await proxy.async_stop()
+    if exporter is not None:
+      await exporter.async_stop()
+    for coordinator in coordinators:
+      await coordinator.omnik_data.async_close()
+      if coordinator.omnik_data.capture is not None:
+        await coordinator.omnik_data.async_flush_capture(hass)
+
+  hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_close_connection)
+
+  if listener is not None:
+    await listener.async_start()
+  if proxy is not None:
+    await proxy.async_start()
+  if exporter is not None:
+    await exporter.async_start()
+
+  if fleet:
+    for type in SITE_SENSOR_TYPES:
+      hass_sensors.append(OmnikSiteSensor(config.get(CONF_NAME), coordinators, type))
+  async_add_entities(hass_sensors)
+  if listen:
+    return
 
-  """ Initialize the Omnik data interface. """
-  data = OmnikData(inverter_host, inverter_port, inverter_sn, used_sensors)
+  if not fleet:
+    """ Poll in the background, so the start of Home Assistant does not wait for the inverter. """
+    hass.async_create_background_task(coordinators[0].async_refresh(),
+                                      'omnik {} first poll'.format(config.get(CONF_NAME)))
+    return
 
-  """ Prepare the sensor entities. """
-  hass_sensors = []
-  for type, subtypes in config[CONF_SENSORS].items():
-    hass_sensors.append(OmnikSensor(inverter_name, inverter_sn, data, type, subtypes))
+  """ Spread the polls of the inverters over the scan interval. """
+  slot = scan_interval.total_seconds() / len(coordinators)
+  for index, coordinator in enumerate(coordinators):
+    async def async_first_refresh(now, coordinator=coordinator):
+      """ Start polling this inverter in its own slot. """
+      await coordinator.async_refresh()
+
+    async_call_later(hass, index * slot + random.uniform(0, slot * POLL_JITTER), async_first_refresh)
+
+class OmnikDataUpdateCoordinator(DataUpdateCoordinator):
+  """
+    Coordinator which polls one inverter on behalf of all its sensors.
+
+    The inverter is queried and decoded once per interval, after which all
+    sensor entities of that inverter are notified with the same data.
+  """
+
+  def __init__(self, hass, inverter_name, data, update_interval, semaphore=None, scheduler=None, sampler=None,
+               push=False):
+    """ Initialize the coordinator. """
+    super().__init__(hass, _LOGGER, name=inverter_name, update_interval=update_interval)
+    self.omnik_data = data
+    self._push = push
+    self._semaphore = semaphore
+    self._scheduler = scheduler
+    self.sampler = sampler
+    self._pending_hours = deque(maxlen=PENDING_HOURS_MAX)
+
+  async def _async_update_data(self):
+    """ Fetch and decode the latest data from the inverter. """
+    if self._push:
+      """ No frame was pushed within the update interval. """
+      self.omnik_data.set_offline()
+      return self.omnik_data.get_sensor_data()
+
+    if self._semaphore is None:
+      await self.omnik_data.async_update()
+    else:
+      async with self._semaphore:
+        await self.omnik_data.async_update()
+
+    """ Write the captured frames to disk once enough have been collected. """
+    if self.omnik_data.capture_pending:
+      await self.omnik_data.async_flush_capture(self.hass)
+
+    """ Let the scheduler pick the interval until the next poll. """
+    if self._scheduler is not None:
+      self.update_interval = self._scheduler.next_interval(
+        self.omnik_data.is_online(), self.omnik_data.get_actualpower(), is_up(self.hass))
+
+    if self.sampler is not None:
+      self._sample()
+
+    return self.omnik_data.get_sensor_data()
+
+  @callback
+  def async_handle_frame(self, frame):
+    """ Update the sensors with a frame pushed by the logger. """
+    self.omnik_data.update_from_frame(frame)
+
+    if self.omnik_data.capture_pending:
+      self.hass.async_create_background_task(self.omnik_data.async_flush_capture(self.hass),
+                                             'omnik {} capture flush'.format(self.name))
+
+    if self.sampler is not None:
+      self._sample()
+
+    self.async_set_updated_data(self.omnik_data.get_sensor_data())
+
+  def proxy_listener(self, proxy):
+    """ Return a listener which passes the latest frame of the inverter to the proxy. """
+    frame_log = self.omnik_data.interface_inverter.frame_log
+    inverter_sn = self.omnik_data.get_inverter_sn()
+
+    @callback
+    def async_update():
+      """ Pass the latest frame to the proxy. """
+      if frame_log:
+        timestamp, frame, _ = frame_log[-1]
+        proxy.update(inverter_sn, frame, timestamp)
+
+    return async_update
+
+  def _sample(self):
+    """ Buffer the values of this poll, and import the statistics of completed hours. """
+    completed = self.sampler.add(time.time(), self.omnik_data.get_sensor_data())
+    if completed is not None:
+      self._pending_hours.append(completed)
+
+    """ Keep the last completed hours until the recorder is available. """
+    if not self._pending_hours or 'recorder' not in self.hass.config.components:
+      return
+    names = {type: '{} {}'.format(self.name, SENSOR_TYPES[type].name) for type in SAMPLED_SENSOR_TYPES}
+    units = {type: SENSOR_TYPES[type].unit for type in SAMPLED_SENSOR_TYPES}
+    async_import_statistics(self.hass, self.omnik_data.get_inverter_sn(), names, units, list(self._pending_hours))
+    self._pending_hours.clear()
+
+class OmnikPollScheduler():
+  """
+    Adaptive interval between the polls of an inverter.
+
+    While the inverter is offline or the sun is below the horizon the interval
+    is doubled up to the maximum interval, as there is nothing to measure.
+    When the actual power changes quickly the interval is halved down to the
+    minimum interval, and once the power settles it returns to the normal
+    scan interval.
+  """
+
+  def __init__(self, interval, min_interval, max_interval):
+    """
+      Initialize the poll scheduler.
 
-  add_devices(hass_sensors)
+      Args:
+        interval (timedelta): normal interval between polls
+        min_interval (timedelta): shortest interval between polls
+        max_interval (timedelta): longest interval between polls
+    """
+    self._base_interval = interval
+    self._min_interval = min_interval
+    self._max_interval = max_interval
+    self._interval = interval
+    self._last_power = None
 
-class OmnikSensor(SensorEntity):
+  def next_interval(self, online, actualpower, sun_up=True):
+    """
+      Determine the interval until the next poll.
+
+      Args:
+        online (bool): whether the inverter responded with valid data
+        actualpower (int): actual power of the inverter in Watt
+        sun_up (bool): whether the sun is above the horizon (Default: True)
+      Returns:
+        timedelta: interval until the next poll
+    """
+    last_power = self._last_power
+    self._last_power = actualpower if online else None
+
+    if not online or not sun_up:
+      self._interval = min(self._interval * 2, self._max_interval)
+    elif (last_power is not None and actualpower is not None and
+          abs(actualpower - last_power) >= max(POWER_CHANGE_MIN, last_power * POWER_CHANGE_RATIO)):
+      self._interval = max(self._interval / 2, self._min_interval)
+    elif self._interval < self._base_interval:
+      self._interval = min(self._interval * 2, self._base_interval)
+    else:
+      self._interval = self._base_interval
+
+    return self._interval
+
+class OmnikSensor(CoordinatorEntity, RestoreSensor):
   """ Representation of an Omnik sensor. """
 
-  def __init__(self, inverter_name, inverter_sn, data, type, subtypes):
+  def __init__(self, inverter_name, inverter_sn, coordinator, type, subtypes, deadbands=None, heartbeat=0,
+               state_interval=0):
     """Initialize the sensor."""
+    super().__init__(coordinator)
     self._inverter_name = inverter_name
-    self._data = data
     self._type = type
-    self._subtypes = subtypes
 
-    self.p_subtypes = {SENSOR_TYPES[subtype][0]: '{}'.format('unknown') for subtype in subtypes}
+    """ Values as last written, to compare new values against. """
+    deadbands = deadbands or {}
+    self._watched = [(type, deadbands.get(type))]
+    self._watched.extend((subtype, deadbands.get(subtype)) for subtype in subtypes)
+    self._written = {watched: None for watched, _ in self._watched}
+    self._heartbeat = heartbeat
+    self._next_heartbeat = 0
+    self._state_interval = state_interval
+    self._next_write = 0
+    self._stale = False
+
+    """ Plan of the attributes, with the unit of each value in a separate attribute. """
+    self._description = SENSOR_TYPES[type]
+    self._attribute_plan = tuple((subtype, SENSOR_TYPES[subtype].name, SENSOR_TYPES[subtype].keeps_last_value)
+                                 for subtype in subtypes)
+    self.p_subtypes = {}
+    for subtype in subtypes:
+      description = SENSOR_TYPES[subtype]
+      self.p_subtypes[description.name] = None
+      if description.unit is not None:
+        self.p_subtypes[ATTR_UNIT.format(description.name)] = description.unit
 
     # Properties
-    self._icon = SENSOR_TYPES[self._type][2]
-    self._name = self._inverter_name + ' ' + SENSOR_TYPES[self._type][0]
+    self._icon = self._description.icon
+    self._name = self._inverter_name + ' ' + self._description.name
     self._attr_native_value = None
-    self._attr_native_unit_of_measurement = SENSOR_TYPES[self._type][1]
-    self._attr_device_class = SENSOR_TYPES[self._type][3]
-    self._attr_state_class = SENSOR_TYPES[self._type][4]
+    self._attr_native_unit_of_measurement = self._description.unit
+    self._attr_device_class = self._description.device_class
+    self._attr_state_class = self._description.state_class
     self._attr_unique_id = f"{inverter_sn}{self._name}".replace(" ", "_")
 
 
-  @property
-  def should_poll(self):
-    """No polling needed."""
-    return True
-
   @property
   def extra_state_attributes(self):
     """Return entity specific state attributes."""
+    if self._stale:
+      return {**self.p_subtypes, ATTR_STALE: True}
     return self.p_subtypes
 
   @property
@@ -157,292 +632,883 @@ class OmnikSensor(SensorEntity):
     """ Return the name of the sensor. """
     return self._name
 
-  def update(self):
-    """ Update this sensor using the data. """
+  async def async_added_to_hass(self):
+    """ Restore the last known state, until the inverter has been polled. """
+    await super().async_added_to_hass()
+    last_data = await self.async_get_last_sensor_data()
+    last_state = await self.async_get_last_state()
+    if last_data is not None and last_state is not None:
+      self._attr_native_value = last_data.native_value
+      for subtype, name, _ in self._attribute_plan:
+        value = last_state.attributes.get(name)
+        if not SENSOR_TYPES[subtype].numeric or isinstance(value, (int, float)):
+          self.p_subtypes[name] = value
+      self._stale = True
+    self._update_from_data()
+
+  @callback
+  def _handle_coordinator_update(self):
+    """ Update this sensor when the coordinator has new data. """
+    if self._update_from_data():
+      self.async_write_ha_state()
+
+  def _has_changed(self, sensor_data):
+    """ Check if any value moved outside its deadband since it was last written. """
+    written = self._written
+    for type, deadband in self._watched:
+      old = written[type]
+      new = sensor_data[type]
+      if deadband is None or old is None or new is None:
+        if new != old:
+          return True
+      elif abs(new - old) > max(deadband[0], abs(old) * deadband[1]):
+        return True
+    return False
+
+  def _update_from_data(self):
+    """
+      Update this sensor using the data.
+
+      Changes within the deadbands are skipped, until the heartbeat interval
+      has passed since the state was last written. No state is written within
+      the state interval after the previous one. While the inverter is offline
+      the last known totals are kept and marked stale, so the statistics do not
+      see a reset.
 
-    """ Get the latest data and use it to update our sensor state. """
-    self._data.update()
+      Returns:
+        bool: whether the state should be written
+    """
 
     """ Retrieve the sensor data from Omnik Data. """
-    sensor_data = self._data.get_sensor_data()
+    sensor_data = self.coordinator.data
+    if sensor_data is None:
+      return False
+
+    now = time.monotonic()
+    if now < self._next_write:
+      return False
+    if now < self._next_heartbeat and not self._has_changed(sensor_data):
+      return False
+    self._next_heartbeat = now + self._heartbeat
+    self._next_write = now + self._state_interval
+    for type, _ in self._watched:
+      self._written[type] = sensor_data[type]
 
     """ Update attribute sensor values. """
-    for subtype in self._subtypes:
+    attributes = self.p_subtypes
+    for subtype, name, keeps_last_value in self._attribute_plan:
       newval = sensor_data[subtype]
-      uom = SENSOR_TYPES[subtype][1]
-      if(uom is None):
-        subtypeval = '{}'.format(newval)
-      else:
-        subtypeval = '{} {}'.format(newval, uom)
-
-      self.p_subtypes[SENSOR_TYPES[subtype][0]] = subtypeval
+      if newval is None and keeps_last_value:
+        continue
+      attributes[name] = newval
 
     """ Update sensor value. """
     new_state = sensor_data[self._type]
-    self._attr_native_value = new_state
+    if new_state is None and self._description.keeps_last_value and self._attr_native_value is not None:
+      self._stale = True
+    else:
+      self._attr_native_value = new_state
+      self._stale = False
+    return True
+
+class OmnikDiagnosticSensor(CoordinatorEntity, SensorEntity):
+  """ Representation of a sensor with a poll metric of an inverter. """
+
+  _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+  def __init__(self, inverter_name, inverter_sn, coordinator, type):
+    """ Initialize the sensor. """
+    super().__init__(coordinator)
+    self._type = type
+    self._metrics = coordinator.omnik_data.interface_inverter.metrics
+
+    # Properties
+    description = DIAGNOSTIC_SENSOR_TYPES[self._type]
+    self._attr_icon = description.icon
+    self._attr_name = inverter_name + ' ' + description.name
+    self._attr_native_value = self._metrics.get_value(self._type)
+    self._attr_native_unit_of_measurement = description.unit
+    self._attr_device_class = description.device_class
+    self._attr_state_class = description.state_class
+    self._attr_unique_id = f"{inverter_sn}{self._attr_name}".replace(" ", "_")
+
+  @callback
+  def _handle_coordinator_update(self):
+    """ Update the metric after every poll. """
+    self._attr_native_value = self._metrics.get_value(self._type)
+    self.async_write_ha_state()
+
+class OmnikSiteSensor(RestoreSensor):
+  """
+    Representation of a sensor which adds up a value of all inverters.
+
+    The last known value of each inverter is used, so an inverter which is
+    offline does not make the energy totals of the site drop. After a restart
+    the restored total is kept until every inverter has reported.
+  """
+
+  _attr_should_poll = False
+
+  def __init__(self, site_name, coordinators, type):
+    """ Initialize the sensor. """
+    self._coordinators = coordinators
+    self._type = type
+    self._values = [None] * len(coordinators)
+    self._stale = False
+
+    # Properties
+    description = SENSOR_TYPES[self._type]
+    self._attr_icon = description.icon
+    self._attr_name = site_name + ' Site ' + description.name
+    self._attr_native_value = None
+    self._attr_native_unit_of_measurement = description.unit
+    self._attr_device_class = description.device_class
+    self._attr_state_class = description.state_class
+    self._attr_unique_id = f"site{self._attr_name}".replace(" ", "_")
+
+  @property
+  def extra_state_attributes(self):
+    """ Return whether the restored total is shown. """
+    if self._stale:
+      return {ATTR_STALE: True}
+    return None
+
+  async def async_added_to_hass(self):
+    """ Restore the last known total and listen to the updates of all inverters. """
+    await super().async_added_to_hass()
+    last_data = await self.async_get_last_sensor_data()
+    if last_data is not None and last_data.native_value is not None:
+      self._attr_native_value = last_data.native_value
+      self._stale = True
+    for coordinator in self._coordinators:
+      self.async_on_remove(coordinator.async_add_listener(self._handle_coordinator_update))
+
+  @callback
+  def _handle_coordinator_update(self):
+    """ Add up the values of the inverters. """
+    total = None
+    for index, coordinator in enumerate(self._coordinators):
+      if coordinator.data is not None:
+        value = coordinator.data.get(self._type)
+        if value is not None and value >= 0:
+          self._values[index] = value
+      if self._values[index] is not None:
+        total = self._values[index] if total is None else total + self._values[index]
+
+    if (None in self._values and SENSOR_TYPES[self._type].keeps_last_value and
+        self._attr_native_value is not None and self._stale):
+      """ Not all inverters have reported since the restart. """
+      return
+
+    self._attr_native_value = total if total is None else round(total, 2)
+    self._stale = False
+    self.async_write_ha_state()
 
 class OmnikData(object):
   """ Representation of a Omnik data object used for retrieving data values. """
 
-  def __init__(self, inverter_host, inverter_port, inverter_sn, sensors):
+  def __init__(self, inverter_host, inverter_port, inverter_sn, sensors, persistent=False, deadlines=None,
+               dns_cache_ttl=DNS_CACHE_TTL.total_seconds()):
     """ Initialize Omnik data component. """
     self._inverter_host = inverter_host
     self._inverter_port = inverter_port
     self._inverter_sn = inverter_sn
     self._sensors = sensors
-    self.interface_inverter = OmnikInverter(self._inverter_host, self._inverter_port, self._inverter_sn)
-    self.sensor_data = {type: None for type in list(self._sensors)}
+    self._derived_sensors = [type for type in sensors if type in DERIVED_SENSOR_TYPES]
+    self._reading_sensors = [type for type in sensors if type not in DERIVED_SENSOR_TYPES]
+    self.aggregator = OmnikAggregator() if self._derived_sensors else None
+    self.interface_inverter = OmnikInverter(self._inverter_host, self._inverter_port, self._inverter_sn, persistent,
+                                            deadlines, dns_cache_ttl)
+    self.circuit_breaker = OmnikCircuitBreaker()
+    self.capture = None
+    self.capture_pending = False
+    self._capture_lock = asyncio.Lock()
+    self._online_data = {type: None for type in list(self._sensors)}
+    self.sensor_data = self._online_data
+
+    """ Data published while the inverter cannot be reached. """
+    self._offline_data = {type: None for type in list(self._sensors)}
+    for type in self._offline_data:
+      if type == 'status':
+        self._offline_data[type] = 'Offline'
+      elif type == 'actualpower' or type.startswith('acoutputpower'):
+        self._offline_data[type] = 0
 
   def get_sensor_data(self):
     """ Return an array with the sensors and their values. """
     return self.sensor_data
 
-  def get_statistics(self):
+  def get_inverter_sn(self):
+    """ Return the serial number of the inverter. """
+    return self._inverter_sn
+
+  async def async_get_statistics(self):
     """ Gets the statistics from the inverter or portal. """
-    self.interface_inverter.get_statistics()
+    await self.interface_inverter.async_get_statistics()
 
-  def read_sensor(self, sensor_type):
-    """Gets the data values from the sensors."""
-    value = None
+  async def async_close(self):
+    """ Close the connection to the inverter. """
+    await self.interface_inverter.async_close()
+
+  async def async_flush_capture(self, hass):
+    """
+      Write the captured frames to disk in an executor.
 
+      The pending records are taken on the event loop, and flushes are done
+      one at a time, so a flush never overlaps another one, for example the
+      flush when Home Assistant stops.
+    """
+    async with self._capture_lock:
+      self.capture_pending = False
+      await hass.async_add_executor_job(self.capture.write, self.capture.take())
+
+  def get_diagnostics(self):
+    """ Return the state of the connection and the last received frames. """
+    breaker = self.circuit_breaker
+    return {
+      'host': self._inverter_host,
+      'port': self._inverter_port,
+      'serial': self._inverter_sn,
+      'circuit_breaker': {
+        'state': breaker.state,
+        'failures': breaker.failures,
+        'retry_delay': breaker.retry_delay,
+      },
+      'sensor_data': dict(self.sensor_data),
+      'address': self.interface_inverter.get_address(),
+      'deadlines': self.interface_inverter.deadlines.get_diagnostics(),
+      'metrics': self.interface_inverter.metrics.get_diagnostics(),
+      'frames': [
+        {
+          'time': datetime.fromtimestamp(timestamp, timezone.utc).isoformat(),
+          'frame': frame.hex(' '),
+          'reading': None if reading is None else asdict(reading),
+        }
+        for timestamp, frame, reading in self.interface_inverter.frame_log
+      ],
+    }
+
+  def update_from_frame(self, frame):
+    """ Update the data of the sensors from a frame pushed by the logger. """
+    metrics = self.interface_inverter.metrics
+    metrics.start()
+    start = time.perf_counter()
+    self.interface_inverter.receive_frame(frame)
+    metrics.finish(time.perf_counter() - start, True)
+    if self.capture is not None:
+      self.capture_pending |= self.capture.append(time.time(), frame)
+    self.circuit_breaker.record_success()
+    self.update_sensor_values()
+
+  def set_offline(self):
+    """ Publish the offline data until the next frame arrives. """
+    self.interface_inverter.reading = None
+    self.sensor_data = self._offline_data
+
+  def is_online(self):
     """ Check if the inverter is operational. """
-    inverter_enabled = False
-    check = self.interface_inverter.get_temperature()
-    if check is not None:
-      inverter_enabled = True
+    reading = self.interface_inverter.reading
+    return reading is not None and reading.temperature is not None
 
-    # TODO: All code below (the way read_sensor is called) needs a refactor.
+  def get_actualpower(self):
+    """ Return the actual power of the last poll, or None if offline. """
+    if not self.is_online():
+      return None
+    return self.interface_inverter.reading.actualpower
 
-    def find_and_get_property(t, values):
-      for (name, getter) in values.items():
-        if t.startswith(name):
-          n = t.removeprefix(name)
-          return getter(int(n))
+  def read_sensor(self, sensor_type):
+    """Gets the data values from the sensors."""
+    reading = self.interface_inverter.reading
+    inverter_enabled = self.is_online()
 
     """ Retrieve value. """
     if sensor_type == "status":
-      if inverter_enabled == True:
-        value = "Online"
-      else:
-        value = "Offline"
-    if sensor_type == "actualpower":
-      if inverter_enabled == True:
-        value = self.interface_inverter.get_actualpower()
-      else:
-        value = 0
-    elif sensor_type == "energytoday":
-      value = self.interface_inverter.get_energytoday()
-    elif sensor_type == "energytotal":
-      value = self.interface_inverter.get_energytotal()
-    elif sensor_type == "hourstotal":
-      value = self.interface_inverter.get_hourstotal()
-    elif sensor_type == "invertersn":
-      value = self.interface_inverter.get_invertersn()
-    elif sensor_type == "temperature":
-      value = self.interface_inverter.get_temperature()
-    elif sensor_type.startswith("dcinput"):
-      t = sensor_type.removeprefix("dcinput")
-      values = {
-        "voltage": self.interface_inverter.get_dcinputvoltage,
-        "current": self.interface_inverter.get_dcinputcurrent,
-      }
-      value = find_and_get_property(t, values)
-    elif sensor_type.startswith("acoutput"):
-      t = sensor_type.removeprefix("acoutput")
-      values = {
-        "voltage": self.interface_inverter.get_acoutputvoltage,
-        "current": self.interface_inverter.get_acoutputcurrent,
-        "frequency": self.interface_inverter.get_acoutputfrequency,
-        "power": self.interface_inverter.get_acoutputpower,
-      }
-      value = find_and_get_property(t, values)
+      return "Online" if inverter_enabled else "Offline"
+    if sensor_type == "actualpower" and not inverter_enabled:
+      return 0
+    if reading is None:
+      return None
 
-    return value
+    return reading.get_value(sensor_type)
 
   def update_sensor_values(self):
     """ Update the sensor data values. """
-    sensor_types_to_query = list(self._sensors)
-    for sensor_type in sensor_types_to_query:
-      self.sensor_data[sensor_type] = self.read_sensor(sensor_type)
+    for sensor_type in self._reading_sensors:
+      self._online_data[sensor_type] = self.read_sensor(sensor_type)
 
-  @Throttle(MIN_TIME_BETWEEN_UPDATES)
-  def update(self):
+    """ Add the reading to the aggregates, and take over the derived values. """
+    if self.aggregator is not None:
+      values = self.aggregator.update(time.monotonic(), self.interface_inverter.reading)
+      for sensor_type in self._derived_sensors:
+        self._online_data[sensor_type] = values[sensor_type]
+    self.sensor_data = self._online_data
+
+  async def async_update(self):
     """ Update the data of the sensors. """
-    self.get_statistics()
+    breaker = self.circuit_breaker
+    if not breaker.allow_request():
+      self.sensor_data = self._offline_data
+      return
+
+    await self.async_get_statistics()
+    raw_msg = self.interface_inverter.raw_msg
+    if self.capture is not None and raw_msg is not None:
+      self.capture_pending |= self.capture.append(time.time(), raw_msg)
+
+    """ Keep track of whether the inverter could be reached. """
+    if raw_msg is None:
+      breaker.record_failure()
+      if not breaker.is_closed():
+        _LOGGER.debug('Inverter on %s:%s is unreachable, next attempt in %d seconds',
+                      self._inverter_host, self._inverter_port, breaker.retry_delay)
+        self.sensor_data = self._offline_data
+        return
+    else:
+      breaker.record_success()
 
     """ Retrieve the data values for the sensors. """
     self.update_sensor_values()
 
-class OmnikInverter():
-  """ Class with function for reading data from the Omnik inverter. """
+class OmnikCircuitBreaker():
+  """
+    Circuit breaker which stops polling an inverter that cannot be reached.
+
+    After a number of consecutive failed polls the breaker opens and polls are
+    skipped. Once the retry delay has passed a single poll is let through to
+    probe the inverter (half-open). When the probe succeeds the breaker closes
+    again, otherwise it reopens with a doubled retry delay.
+  """
+
+  CLOSED = 'closed'
+  OPEN = 'open'
+  HALF_OPEN = 'half_open'
+
+  def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+               min_retry_delay=BREAKER_RETRY_DELAY_MIN, max_retry_delay=BREAKER_RETRY_DELAY_MAX):
+    """ Initialize the circuit breaker. """
+    self._failure_threshold = failure_threshold
+    self._min_retry_delay = min_retry_delay
+    self._max_retry_delay = max_retry_delay
+    self.state = OmnikCircuitBreaker.CLOSED
+    self.failures = 0
+    self.retry_delay = 0
+    self._retry_at = 0
+
+  def is_closed(self):
+    """ Return whether polls are let through normally. """
+    return self.state == OmnikCircuitBreaker.CLOSED
+
+  def allow_request(self):
+    """ Return whether the inverter should be polled now. """
+    if self.state == OmnikCircuitBreaker.CLOSED:
+      return True
+    if self.state == OmnikCircuitBreaker.OPEN and time.monotonic() >= self._retry_at:
+      self.state = OmnikCircuitBreaker.HALF_OPEN
+      return True
+    return False
+
+  def record_success(self):
+    """ Close the breaker after a successful poll. """
+    self.state = OmnikCircuitBreaker.CLOSED
+    self.failures = 0
+    self.retry_delay = 0
+
+  def record_failure(self):
+    """ Count a failed poll and open the breaker when needed. """
+    self.failures += 1
+    if self.state == OmnikCircuitBreaker.HALF_OPEN or self.failures >= self._failure_threshold:
+      self.state = OmnikCircuitBreaker.OPEN
+      self.retry_delay = min(max(self.retry_delay * 2, self._min_retry_delay), self._max_retry_delay)
+      self._retry_at = time.monotonic() + self.retry_delay
+
+class OmnikDeadlines():
+  """
+    Connect, read and poll deadlines of an inverter.
+
+    The connect deadline bounds resolving the host and opening the connection
+    each, so a poll which resolves the host can take up to twice the connect
+    deadline before the request is sent. The read deadline bounds receiving a
+    frame after a request, and the poll deadline bounds the whole poll
+    including repeated requests.
+
+    Adaptive deadlines are derived from the round-trip times of the previous
+    polls: a multiple of the 99th percentile of the connect and receive
+    phases, never above the configured deadlines. Until enough polls have
+    been timed, and for the poll after a timeout or a short frame, the
+    configured deadlines are used.
+  """
+
+  def __init__(self, connect=CONNECT_TIMEOUT.total_seconds(), read=READ_TIMEOUT.total_seconds(),
+               poll=POLL_TIMEOUT.total_seconds(), adaptive=False):
+    """
+      Initialize the deadlines.
 
-  def __init__(self, host, port, serial_number):
-    """ Initialize the Omnik inverter object. """
-    self._host = host
-    self._port = port
-    self._serial_number = serial_number
-    self.raw_msg = None
+      Args:
+        connect (float): deadline to connect in seconds
+        read (float): deadline to receive a frame in seconds
+        poll (float): deadline of a complete poll in seconds
+        adaptive (bool): derive the deadlines from the round-trip times (Default: False)
+    """
+    self._max_connect = connect
+    self._max_read = read
+    self._adaptive = adaptive
+    self._timeouts = 0
+    self.connect = connect
+    self.read = read
+    self.poll = poll
+
+  def update(self, metrics):
+    """ Determine the deadlines of the next poll from the metrics of the previous ones. """
+    if not self._adaptive:
+      return
+    timeouts = metrics.counters['timeouts'] + metrics.counters['short_frames']
+    relax = timeouts != self._timeouts
+    self._timeouts = timeouts
+    self.connect = self._derive(metrics.histograms['connect'], self._max_connect, relax)
+    self.read = self._derive(metrics.histograms['receive'], self._max_read, relax)
 
   @staticmethod
-  def generate_request(serial_number):
+  def _derive(histogram, maximum, relax):
+    """ Derive a deadline from the 99th percentile of a phase. """
+    if relax or histogram.count < ADAPTIVE_TIMEOUT_SAMPLES:
+      return maximum
+    return min(max(histogram.percentile(0.99) * ADAPTIVE_TIMEOUT_FACTOR, ADAPTIVE_TIMEOUT_MIN), maximum)
+
+  def get_diagnostics(self):
+    """ Return the current deadlines in seconds. """
+    return {
+      'adaptive': self._adaptive,
+      'connect': round(self.connect, 3),
+      'read': round(self.read, 3),
+      'poll': round(self.poll, 3),
+    }
+
+def _decode_short(num, divider=10):
+  """ Convert a raw short to its value; 0xFFFF marks an unused channel. """
+  if num == 65535:
+    return -1
+  if divider == 1:
+    return num
+  return num / divider
+
+@dataclass(frozen=True, slots=True)
+class OmnikReading:
+  """
+    Decoded values of a single statistics frame of the inverter.
+
+    The channel values are stored as tuples, where index 0 holds channel 1.
+  """
+
+  invertersn: str | None
+  temperature: float | None
+  dcinputvoltage: tuple
+  dcinputcurrent: tuple
+  acoutputcurrent: tuple
+  acoutputvoltage: tuple
+  acoutputfrequency: tuple
+  acoutputpower: tuple
+  energytoday: float
+  energytotal: float
+  hourstotal: int
+
+  @property
+  def actualpower(self):
+    """ The actual power is reported as the power of AC output channel 1. """
+    return self.acoutputpower[0]
+
+  @classmethod
+  def from_frame(cls, frame):
     """
-      Create request string for inverter.
-      The request string is build from several parts. The first part is a fixed
-      4 char string; the second part is the reversed hex notation of the
-      serial number twice; then again a fixed string of two chars; a checksum of
-      the double serial number with an offset; and finally a fixed ending char.
+      Decode all values from a statistics frame in one pass.
 
-      Arguments:
-        serial_no (integer): Serial number of the inverter
+      Args:
+        frame (bytes): raw message received from the inverter
       Returns:
-        string: Information request string for inverter
+        OmnikReading: the decoded values, or None if the frame is too short
     """
+    if frame is None or len(frame) < FRAME_LAYOUT_END:
+      return None
 
-    """ Convert the serial number into a bytes array. """
-    double_hex = hex(serial_number)[2:] * 2
-    serial_bytes = bytearray.fromhex(double_hex)
-    serial_bytes.reverse()
+    (sn, temp,
+     dcv1, dcv2, dcv3, dci1, dci2, dci3,
+     aci1, aci2, aci3, acv1, acv2, acv3,
+     acf1, acp1, acf2, acp2, acf3, acp3,
+     today, total, hours) = FRAME_LAYOUT.unpack_from(memoryview(frame), FRAME_LAYOUT_OFFSET)
 
-    cs_count = 115 + sum(serial_bytes)
-    checksum = bytearray.fromhex(hex(cs_count)[-2:])
+    try:
+      invertersn = sn.decode()
+    except UnicodeDecodeError:
+      invertersn = None
+
+    """ A temperature above 150 means the inverter power is turned off. """
+    temperature = _decode_short(temp)
+    if temperature > 150:
+      temperature = None
+
+    return cls(
+      invertersn=invertersn,
+      temperature=temperature,
+      dcinputvoltage=(_decode_short(dcv1), _decode_short(dcv2), _decode_short(dcv3)),
+      dcinputcurrent=(_decode_short(dci1), _decode_short(dci2), _decode_short(dci3)),
+      acoutputcurrent=(_decode_short(aci1), _decode_short(aci2), _decode_short(aci3)),
+      acoutputvoltage=(_decode_short(acv1), _decode_short(acv2), _decode_short(acv3)),
+      acoutputfrequency=(_decode_short(acf1, 100), _decode_short(acf2, 100), _decode_short(acf3, 100)),
+      acoutputpower=(_decode_short(acp1, 1), _decode_short(acp2, 1), _decode_short(acp3, 1)),
+      energytoday=_decode_short(today, 100),
+      energytotal=total / 10,
+      hourstotal=hours,
+    )
+
+  def get_value(self, sensor_type):
+    """ Return the value for a key of SENSOR_TYPES. """
+    field, channel = _READING_FIELDS[sensor_type]
+    value = getattr(self, field)
+    if channel is not None:
+      value = value[channel]
+    return value
 
-    """ Construct the message which requests the statistics. """
-    request_data = bytearray([0x68, 0x02, 0x40, 0x30])
-    request_data.extend(serial_bytes)
-    request_data.extend([0x01, 0x00])
-    request_data.extend(checksum)
-    request_data.append(0x16)
+""" Map each sensor type to its reading field and channel index. """
+_READING_FIELDS = {
+  'actualpower': ('actualpower', None),
+  'energytoday': ('energytoday', None),
+  'energytotal': ('energytotal', None),
+  'hourstotal':  ('hourstotal', None),
+  'invertersn':  ('invertersn', None),
+  'temperature': ('temperature', None),
+}
+for _field in ('dcinputvoltage', 'dcinputcurrent', 'acoutputvoltage',
+               'acoutputcurrent', 'acoutputfrequency', 'acoutputpower'):
+  for _channel in range(3):
+    _READING_FIELDS['{}{}'.format(_field, _channel + 1)] = (_field, _channel)
 
-    _LOGGER.info('Request: %s', request_data.hex(' '))
-    return request_data
+class OmnikInverter():
+  """ Class with function for reading data from the Omnik inverter. """
 
-  def get_statistics(self):
-    """ Get statistics from the inverter. """
+  def __init__(self, host, port, serial_number, persistent=False, deadlines=None,
+               dns_cache_ttl=DNS_CACHE_TTL.total_seconds()):
+    """
+      Initialize the Omnik inverter object.
 
-    sock = None
+      Args:
+        host (str): host name or IP address of the inverter
+        port (int): TCP port of the inverter
+        serial_number (int): serial number of the Wi-Fi logger
+        persistent (bool): keep the connection open between polls (Default: False)
+        deadlines (OmnikDeadlines): deadlines of a poll (Default: the default deadlines)
+        dns_cache_ttl (float): time in seconds a resolved address is reused (Default: 300)
+    """
+    self._host = host
+    self._port = port
+    self._serial_number = serial_number
+    self._persistent = persistent
+    self.deadlines = deadlines if deadlines is not None else OmnikDeadlines()
+    self._dns_cache_ttl = dns_cache_ttl
+    self._address = None
+    self._address_expiry = 0
+    self._request = bytes(generate_request(serial_number))
+    self._reader = None
+    self._writer = None
+    self._reconnect_delay = 0
+    self._next_connect = 0
+    self.raw_msg = None
+    self.reading = None
+    self.frame_log = deque(maxlen=FRAME_LOG_SIZE)
+    self.metrics = OmnikPollMetrics()
+    self._parser = OmnikFrameParser()
+    self._lock = asyncio.Lock()
+
+  def receive_frame(self, frame):
+    """ Decode and keep a frame received from the logger. """
+    self.raw_msg = frame
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+      _LOGGER.debug('Response: %s', frame.hex(' '))
+    start = time.perf_counter()
+    self.reading = OmnikReading.from_frame(frame)
+    self.metrics.record('decode', time.perf_counter() - start)
+    if self.reading is None or self.reading.temperature is None:
+      """ An acknowledgement without statistics, or statistics of an inverter which is off. """
+      self.metrics.count('offline_frames')
+    self.frame_log.append((time.time(), frame, self.reading))
+
+  def _count_failure(self, err):
+    """ Count a failed connection by its cause. """
+    if isinstance(err, asyncio.TimeoutError):
+      self.metrics.count('timeouts')
+    elif isinstance(err, ConnectionRefusedError):
+      self.metrics.count('refused')
+    elif isinstance(err, socket.gaierror):
+      self.metrics.count('dns_failures')
+    else:
+      self.metrics.count('connection_errors')
+
+  async def async_get_statistics(self):
+    """
+      Get statistics from the inverter.
+
+      The connection is made with asyncio streams, so waiting for a slow or
+      offline inverter does not occupy an executor thread. When data is
+      received but no valid frame could be extracted from it, the request is
+      repeated within the same poll.
+
+      In persistent mode the connection is kept open and reused by the next
+      poll. A reused connection which turns out to be dead is replaced
+      immediately, while failing to connect delays the next attempt with an
+      exponential backoff.
+
+      The duration of every phase of the poll and the causes of failures are
+      recorded in the metrics. Polls of the same inverter, for example from a
+      manual update during a scheduled one, are done one at a time, and a poll
+      which exceeds the poll deadline is abandoned.
+    """
+    async with self._lock:
+      metrics = self.metrics
+      metrics.start()
+      self.deadlines.update(metrics)
+      start = time.perf_counter()
+      try:
+        await asyncio.wait_for(self._async_poll(), self.deadlines.poll)
+      except asyncio.TimeoutError:
+        metrics.count('timeouts')
+        _LOGGER.debug('Poll of the inverter on %s:%s exceeded its deadline', self._host, self._port)
+        await self.async_close()
+      metrics.finish(time.perf_counter() - start, self.raw_msg is not None)
+
+  def get_address(self):
+    """ Return the cached address of the inverter, or None when not resolved yet. """
+    return self._address
+
+  async def _async_poll(self):
+    """ Request and receive the statistics frame. """
+    self.raw_msg = None
+    self.reading = None
+
+    attempt = 1
+    while attempt <= REQUEST_ATTEMPTS:
+      """ Connect to server, or reuse the open connection. """
+      reused = self._writer is not None
+      try:
+        reader, writer = await self._async_connect()
+      except (OSError, asyncio.TimeoutError) as err:
+        self._count_failure(err)
+        _LOGGER.debug('Could not connect to the inverter on %s:%s', self._host, self._port)
+        return
+      if writer is None:
+        _LOGGER.debug('Waiting to reconnect to the inverter on %s:%s', self._host, self._port)
+        return
+
+      """ Query the server and receive data. """
+      metrics = self.metrics
+      rejected = self._parser.rejected
+      try:
+        start = time.perf_counter()
+        writer.write(self._request)
+        await writer.drain()
+        sent = time.perf_counter()
+        metrics.record('send', sent - start)
+        frame, received = await self._async_read_frame(reader)
+        metrics.record('receive', time.perf_counter() - sent)
+      except OSError as err:
+        self._count_failure(err)
+        frame, received = None, False
+      metrics.count('invalid_frames', self._parser.rejected - rejected)
+
+      if frame is None or not self._persistent:
+        await self.async_close()
+
+      if frame is not None:
+        self.receive_frame(frame)
+        return
+
+      if not received:
+        if reused:
+          """ The kept open connection was half-open, try a new one. """
+          _LOGGER.debug('Connection to the inverter on %s:%s was lost', self._host, self._port)
+          continue
+        _LOGGER.debug('No response from the inverter on %s:%s', self._host, self._port)
+        return
+
+      _LOGGER.debug('Invalid response from the inverter on %s:%s (attempt %d of %d)',
+                    self._host, self._port, attempt, REQUEST_ATTEMPTS)
+      attempt += 1
 
-    """ Create a socket (SOCK_STREAM means a TCP socket). """
-    try:
-      sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-      sock.settimeout(3)
-    except:
-      sock = None
+    return
 
-    """ Connect to server. """
-    try:
-      sock.connect((self._host, self._port))
-    except:
-      sock.close()
-      sock = None
-
-    if sock is None:
-      self.raw_msg = None
-      _LOGGER.debug('Could not connect to the inverter on %s:%s', self._host, self._port)
-      return
+  async def _async_connect(self):
+    """
+      Open a connection to the inverter, or return the open connection.
 
-    """ Query the server and receive data. """
-    with sock:
-      sock.sendall(OmnikInverter.generate_request(self._serial_number))
-      self.raw_msg = sock.recv(1024)
-      _LOGGER.info('Response: %s', self.raw_msg.hex(' '))
+      Returns:
+        tuple: reader and writer, or (None, None) while waiting for a reconnect
+    """
+    writer = self._writer
+    if writer is not None:
+      if not writer.is_closing() and not self._reader.at_eof():
+        return self._reader, writer
+      await self.async_close()
 
-    return
+    loop = asyncio.get_running_loop()
+    if self._persistent and loop.time() < self._next_connect:
+      return None, None
 
-  def __get_string(self, begin, end):
+    try:
+      address = await self._async_resolve()
+      start = time.perf_counter()
+      reader, writer = await asyncio.wait_for(asyncio.open_connection(address, self._port), self.deadlines.connect)
+      self.metrics.record('connect', time.perf_counter() - start)
+    except (OSError, asyncio.TimeoutError):
+      """ The inverter may have a new address, resolve it again next time. """
+      self._address_expiry = 0
+      if self._persistent:
+        self._reconnect_delay = min(max(self._reconnect_delay * 2, RECONNECT_DELAY_MIN), RECONNECT_DELAY_MAX)
+        self._next_connect = loop.time() + self._reconnect_delay
+      raise
+
+    self._reconnect_delay = 0
+    self._reader = reader
+    self._writer = writer
+    return reader, writer
+
+  async def _async_resolve(self):
     """
-      Extract string from message.
+      Resolve the host of the inverter, or return the cached address.
 
-      Args:
-        begin (int): starting byte index of string
-        end (int): end byte index of string
+      A resolved address is reused until its TTL has passed. When resolving
+      fails the last known address is used instead, and resolving is retried
+      after a short delay.
 
       Returns:
-        str: String in the message from start to end
+        str: IP address of the inverter
     """
+    now = time.monotonic()
+    if self._address is not None and now < self._address_expiry:
+      return self._address
 
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
     try:
-      value = self.raw_msg[begin:end].decode()
-    except:
-      value = None
+      addresses = await asyncio.wait_for(
+        loop.getaddrinfo(self._host, self._port, type=socket.SOCK_STREAM), self.deadlines.connect)
+    except (OSError, asyncio.TimeoutError) as err:
+      if self._address is None:
+        if isinstance(err, asyncio.TimeoutError):
+          """ Count a slow name server as a failure to resolve, not as a timeout of the inverter. """
+          raise socket.gaierror(socket.EAI_AGAIN, 'timeout resolving {}'.format(self._host)) from err
+        raise
+      self.metrics.count('dns_failures')
+      _LOGGER.debug('Could not resolve %s, using the last known address %s', self._host, self._address)
+      self._address_expiry = now + min(self._dns_cache_ttl, DNS_RETRY_DELAY)
+      return self._address
+    finally:
+      self.metrics.record('dns', time.perf_counter() - start)
+
+    self._address = addresses[0][4][0]
+    self._address_expiry = now + self._dns_cache_ttl
+    return self._address
+
+  async def async_close(self):
+    """ Close the connection to the inverter. """
+    writer = self._writer
+    self._reader = None
+    self._writer = None
+    if writer is None:
+      return
 
-    return value
+    writer.close()
+    try:
+      await writer.wait_closed()
+    except OSError:
+      pass
 
-  def __get_short(self, begin, divider=10):
+  async def _async_read_frame(self, reader):
     """
-      Extract short from message.
-      The shorts in the message could actually be a decimal number. This is
-      done by storing the number multiplied in the message. So by dividing the
-      short the original decimal number can be retrieved.
+      Read from the connection until a valid frame has been received.
+
+      Without a frame the cause is counted: a timeout when nothing was
+      received, a connection error when the connection was closed before any
+      data arrived, and a short frame when only part of a response arrived.
 
       Args:
-        begin (int): index of short in message
-        divider (int): divider to change short to float. (Default: 10)
+        reader (StreamReader): stream of the connection to the inverter
       Returns:
-        int or float: Value stored at location `begin`
+        tuple: the frame (or None) and whether any data was received
     """
-    try:
-      num = struct.unpack('!H', self.raw_msg[begin:begin + 2])[0]
-      if num == 65535:
-        value = -1
-      else:
-        value = float(num) / divider
-    except:
-      value = None
-
-    return value
-
-  def __get_long(self, begin, divider=10):
+    parser = self._parser
+    parser.reset()
+    received = False
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + self.deadlines.read
+
+    while True:
+      remaining = deadline - loop.time()
+      try:
+        if remaining <= 0:
+          raise asyncio.TimeoutError
+        data = await asyncio.wait_for(reader.read(READ_SIZE), remaining)
+      except asyncio.TimeoutError:
+        data = None
+      if not data:
+        if received:
+          self.metrics.count('short_frames')
+        elif data is None:
+          self.metrics.count('timeouts')
+        else:
+          self.metrics.count('connection_errors')
+        return None, received
+
+      received = True
+      frames = parser.feed(data)
+      if frames:
+        """ Prefer a statistics frame if several frames arrived at once. """
+        return max(frames, key=len), received
+
+  def __get_field(self, field, channel=None):
     """
-      Extract long from message.
-
-      The longs in the message could actually be a decimal number. By dividing
-      the long, the original decimal number can be extracted.
+      Get a value from the decoded reading.
 
       Args:
-        begin (int): index of long in message
-        divider (int): divider to change long to float. (Default : 10)
+        field (str): name of the field in the reading
+        channel (int): index of the channel for channel values (Default: None)
       Returns:
-        int or float: Value stored at location `begin`
+        Value of the field, or None when no valid frame was received
     """
-    try:
-      value =  float(struct.unpack('!I', self.raw_msg[begin:begin + 4])[0]) / divider
-    except:
-      value = None
+    reading = self.reading
+    if reading is None:
+      return None
+
+    value = getattr(reading, field)
+    if channel is not None:
+      value = value[channel]
 
     return value
 
   def get_actualpower(self):
     """ Gets the actual power output by the inverter in Watt. """
-    value = self.__get_short(59, 1) # Don't divide
-    if(value is not None):
-      value = int(value)
-    _LOGGER.info('get_actualpower: %s', repr(value))
+    value = self.__get_field('actualpower')
+    _LOGGER.debug('get_actualpower: %r', value)
     return value
 
   def get_energytoday(self):
     """ Gets the energy generated by inverter today in kWh. """
-    value = self.__get_short(69, 100) # Divide by 100
-    _LOGGER.info('get_energytoday: %s', repr(value))
+    value = self.__get_field('energytoday')
+    _LOGGER.debug('get_energytoday: %r', value)
     return value
 
   def get_energytotal(self):
     """ Gets the total energy generated by inverter in kWh. """
-    value = self.__get_long(71)
-    _LOGGER.info('get_energytotal: %s', repr(value))
+    value = self.__get_field('energytotal')
+    _LOGGER.debug('get_energytotal: %r', value)
     return value
 
   def get_hourstotal(self):
     """ Gets the hours the inverter generated electricity. """
-    value = self.__get_long(75, 1) # Don't divide
-    if(value is not None):
-      value = int(value)
-    _LOGGER.info('get_hourstotal: %s', repr(value))
+    value = self.__get_field('hourstotal')
+    _LOGGER.debug('get_hourstotal: %r', value)
     return value
 
   def get_invertersn(self):
     """ Gets the serial number of the inverter. """
-    value = self.__get_string(15, 31)
-    _LOGGER.info('get_invertersn: %s', value)
+    value = self.__get_field('invertersn')
+    _LOGGER.debug('get_invertersn: %s', value)
     return value
 
   def get_temperature(self):
@@ -452,11 +1518,8 @@ class OmnikInverter():
       If the temperature is higher then 6500 the inverter power is turned off
       and no temperature is measured.
     """
-    value = self.__get_short(31)
-    if (value is not None):
-      if(value > 150):
-        value = None
-    _LOGGER.info('get_temperature: %s', repr(value))
+    value = self.__get_field('temperature')
+    _LOGGER.debug('get_temperature: %r', value)
     return value
 
   def get_dcinputvoltage(self, i=1):
@@ -473,9 +1536,8 @@ class OmnikInverter():
     """
     if i not in range(1, 4):
       i = 1
-    num = 33 + (i - 1) * 2
-    value = self.__get_short(num)
-    _LOGGER.info('get_dcinputvoltage%d: %s', i, repr(value))
+    value = self.__get_field('dcinputvoltage', i - 1)
+    _LOGGER.debug('get_dcinputvoltage%d: %r', i, value)
     return value
 
   def get_dcinputcurrent(self, i=1):
@@ -491,9 +1553,8 @@ class OmnikInverter():
     """
     if i not in range(1, 4):
       i = 1
-    num = 39 + (i - 1) * 2
-    value = self.__get_short(num)
-    _LOGGER.info('get_dcinputcurrent%d: %s', i, repr(value))
+    value = self.__get_field('dcinputcurrent', i - 1)
+    _LOGGER.debug('get_dcinputcurrent%d: %r', i, value)
     return value
 
   def get_acoutputvoltage(self, i=1):
@@ -511,9 +1572,8 @@ class OmnikInverter():
     """
     if i not in range(1, 4):
       i = 1
-    num = 51 + (i - 1) * 2
-    value = self.__get_short(num)
-    _LOGGER.info('get_acoutputvoltage%d: %s', i, repr(value))
+    value = self.__get_field('acoutputvoltage', i - 1)
+    _LOGGER.debug('get_acoutputvoltage%d: %r', i, value)
     return value
 
   def get_acoutputcurrent(self, i=1):
@@ -531,9 +1591,8 @@ class OmnikInverter():
     """
     if i not in range(1, 4):
       i = 1
-    num = 45 + (i - 1) * 2
-    value = self.__get_short(num)
-    _LOGGER.info('get_acoutputcurrent%d: %s', i, repr(value))
+    value = self.__get_field('acoutputcurrent', i - 1)
+    _LOGGER.debug('get_acoutputcurrent%d: %r', i, value)
     return value
 
   def get_acoutputfrequency(self, i=1):
@@ -551,9 +1610,8 @@ class OmnikInverter():
     """
     if i not in range(1, 4):
       i = 1
-    num = 57 + (i - 1) * 4
-    value = self.__get_short(num, 100)
-    _LOGGER.info('get_acoutputfrequency%d: %s', i, repr(value))
+    value = self.__get_field('acoutputfrequency', i - 1)
+    _LOGGER.debug('get_acoutputfrequency%d: %r', i, value)
     return value
 
   def get_acoutputpower(self, i=1):
@@ -571,9 +1629,6 @@ class OmnikInverter():
     """
     if i not in range(1, 4):
       i = 1
-    num = 59 + (i - 1) * 4
-    value = self.__get_short(num, 1) # Don't divide
-    if(value is not None):
-      value = int(value)
-    _LOGGER.info('get_acoutputpower%d: %s', i, repr(value))
+    value = self.__get_field('acoutputpower', i - 1)
+    _LOGGER.debug('get_acoutputpower%d: %r', i, value)
     return value
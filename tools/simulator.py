@@ -0,0 +1,221 @@
+"""
+  Simulator of Omnik/Trannergy inverters with a Wi-Fi logger.
+
+  Every simulated inverter listens on its own TCP port and answers the
+  statistics request built by protocol.generate_request with a frame in
+  the same layout as a real logger. The actual power follows a daily curve
+  with passing clouds, and energy today/total are integrated from it. During
+  the night the logger only acknowledges the request, like a real logger of
+  an inverter which is turned off.
+
+  Faults can be injected per request with a given probability: a slow accept,
+  a response sent in small parts, a connection reset without response, and
+  garbage bytes before the response.
+
+  Only the protocol modules of the integration are imported, so Home
+  Assistant does not need to be installed. Run from the root of the
+  repository, for example to simulate 200 inverters on ports 18899-19098
+  with serial numbers 1612345603-1612345802:
+
+    python tools/simulator.py --count 200 --base-port 18899 --reset 0.05
+"""
+
+import argparse
+import asyncio
+import logging
+import math
+import random
+import sys
+import time
+import types
+from pathlib import Path
+
+""" Import the protocol modules without the package __init__, which needs Home Assistant. """
+_package = types.ModuleType('omnik')
+_package.__path__ = [str(Path(__file__).resolve().parents[1] / 'custom_components' / 'omnik')]
+sys.modules['omnik'] = _package
+
+from omnik.const import FRAME_END, FRAME_LAYOUT, FRAME_START  # noqa: E402
+from omnik.protocol import OmnikFrameParser, generate_request  # noqa: E402
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_BASE_PORT = 18899
+DEFAULT_BASE_SERIAL = 1612345603
+DEFAULT_PEAK_POWER = 4000
+DEFAULT_SLOW_ACCEPT_DELAY = 5
+OFFLINE_PAYLOAD = b'DATA SEND IS OK\r\n'
+UNUSED = 65535
+
+def build_frame(serial_number, payload):
+  """
+    Build a frame as sent by the logger.
+
+    Args:
+      serial_number (int): serial number of the Wi-Fi logger
+      payload (bytes): payload of the frame
+    Returns:
+      bytes: the complete frame
+  """
+  serial_bytes = serial_number.to_bytes(4, 'little')
+  body = bytes([len(payload), 0x41, 0xb0]) + serial_bytes + serial_bytes + payload
+  return bytes([FRAME_START]) + body + bytes([sum(body) & 0xFF, FRAME_END])
+
+class SimulatedInverter():
+  """ A single simulated inverter with its Wi-Fi logger. """
+
+  def __init__(self, serial_number, port, options):
+    """ Initialize the simulated inverter. """
+    self.serial_number = serial_number
+    self.port = port
+    self.requests = 0
+    self.invalid_requests = 0
+    self._options = options
+    self._request = bytes(generate_request(serial_number))
+    self._invertersn = 'NLDN{:012d}'.format(serial_number).encode()
+    self._energytoday = 0.0
+    self._energytotal = 1000 + random.uniform(0, 9000)
+    self._hourstotal = 5000 + random.randrange(10000)
+    self._cloud = 1.0
+    self._last_update = time.monotonic()
+    self._server = None
+
+  async def async_start(self, host):
+    """ Start listening for requests. """
+    self._server = await asyncio.start_server(self._async_handle_connection, host, self.port)
+
+  def close(self):
+    """ Stop listening for requests. """
+    if self._server is not None:
+      self._server.close()
+
+  def _actualpower(self):
+    """ Advance the simulation and return the actual power in Watt. """
+    options = self._options
+    now = time.monotonic()
+    elapsed = now - self._last_update
+    self._last_update = now
+
+    """ A daily curve between 06:00 and 18:00, scaled to the day length. """
+    phase = (time.time() % options.day_length) / options.day_length
+    sun = math.sin((phase - 0.25) * 2 * math.pi)
+    if sun <= 0:
+      return None
+
+    """ Clouds passing by make the power change quickly. """
+    self._cloud = min(1.0, max(0.2, self._cloud + random.uniform(-0.1, 0.1)))
+    power = int(options.peak_power * sun * self._cloud)
+
+    energy = power * elapsed / 3600000 * 86400 / options.day_length
+    self._energytoday += energy
+    self._energytotal += energy
+    self._hourstotal += elapsed / 3600
+    return power
+
+  def _response(self):
+    """ Build the response frame for the current state of the inverter. """
+    power = self._actualpower()
+    if power is None:
+      self._energytoday = 0.0
+      return build_frame(self.serial_number, OFFLINE_PAYLOAD)
+
+    voltage = 2300 + random.randrange(-30, 30)
+    current = int(power / 230 * 10)
+    dcvoltage = 3000 + random.randrange(-100, 100)
+    dccurrent = int(power / 2 / 300 * 10)
+    values = FRAME_LAYOUT.pack(
+      self._invertersn, 350 + random.randrange(100),
+      dcvoltage, dcvoltage - 50, UNUSED,
+      dccurrent, dccurrent, UNUSED,
+      current, UNUSED, UNUSED,
+      voltage, UNUSED, UNUSED,
+      5000 + random.randrange(-5, 5), power, UNUSED, UNUSED, UNUSED, UNUSED,
+      int(self._energytoday * 100), int(self._energytotal * 10), int(self._hourstotal))
+    return build_frame(self.serial_number, bytes([0x81, 0x02, 0x01]) + values + bytes(20))
+
+  async def _async_handle_connection(self, reader, writer):
+    """ Answer the requests received over a connection. """
+    options = self._options
+    parser = OmnikFrameParser()
+    try:
+      if random.random() < options.slow_accept:
+        await asyncio.sleep(options.slow_accept_delay)
+
+      while True:
+        data = await reader.read(1024)
+        if not data:
+          break
+
+        for request in parser.feed(data):
+          self.requests += 1
+          if request != self._request:
+            """ A logger does not answer a request for another serial number. """
+            self.invalid_requests += 1
+            continue
+
+          if random.random() < options.reset:
+            writer.transport.abort()
+            return
+
+          response = self._response()
+          if random.random() < options.garbage:
+            response = random.randbytes(random.randrange(1, 32)) + response
+
+          if random.random() < options.partial:
+            for start in range(0, len(response), 8):
+              writer.write(response[start:start + 8])
+              await writer.drain()
+              await asyncio.sleep(0.01)
+          else:
+            writer.write(response)
+            await writer.drain()
+    except ConnectionError:
+      pass
+    finally:
+      writer.close()
+
+async def async_main(options):
+  """ Run the simulated inverters until interrupted. """
+  inverters = [
+    SimulatedInverter(options.base_serial + index, options.base_port + index, options)
+    for index in range(options.count)
+  ]
+  await asyncio.gather(*(inverter.async_start(options.host) for inverter in inverters))
+  _LOGGER.info('Simulating %d inverters on %s:%d-%d', len(inverters), options.host,
+               options.base_port, options.base_port + len(inverters) - 1)
+
+  try:
+    while True:
+      await asyncio.sleep(60)
+      _LOGGER.info('Requests: %d, invalid requests: %d',
+                   sum(inverter.requests for inverter in inverters),
+                   sum(inverter.invalid_requests for inverter in inverters))
+  finally:
+    for inverter in inverters:
+      inverter.close()
+
+def main():
+  """ Parse the arguments and run the simulator. """
+  parser = argparse.ArgumentParser(description='Simulator of Omnik/Trannergy inverters.')
+  parser.add_argument('--count', type=int, default=1, help='number of inverters')
+  parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on')
+  parser.add_argument('--base-port', type=int, default=DEFAULT_BASE_PORT, help='port of the first inverter')
+  parser.add_argument('--base-serial', type=int, default=DEFAULT_BASE_SERIAL, help='serial number of the first inverter')
+  parser.add_argument('--peak-power', type=int, default=DEFAULT_PEAK_POWER, help='peak power in Watt')
+  parser.add_argument('--day-length', type=float, default=86400, help='length of a simulated day in seconds')
+  parser.add_argument('--slow-accept', type=float, default=0, help='probability of a slow accept')
+  parser.add_argument('--slow-accept-delay', type=float, default=DEFAULT_SLOW_ACCEPT_DELAY, help='delay of a slow accept in seconds')
+  parser.add_argument('--partial', type=float, default=0, help='probability of a response sent in parts')
+  parser.add_argument('--reset', type=float, default=0, help='probability of a connection reset')
+  parser.add_argument('--garbage', type=float, default=0, help='probability of garbage before a response')
+  options = parser.parse_args()
+
+  logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+  try:
+    asyncio.run(async_main(options))
+  except KeyboardInterrupt:
+    pass
+
+if __name__ == '__main__':
+  main()